@@ -18,172 +18,61 @@ Requires these files in the step3/input dir
     Google Javanese lexicon: https://github.com/google/language-resources/blob/master/jv/data/lexicon.tsv
     Google Sundanese lexicon: https://github.com/google/language-resources/blob/master/su/data/lexicon.tsv
     Cleaned techer data from previous cleaning step
+        (manCleanTIW.txt, and manCleanTIW.vocab and manCleanTIW.ids if createCleanCorpus.py was run with --vocab)
 """
 
-import csv
 import os
 
+from lexiconIndex import LexiconIndex
+from lexicons import loadLexicons
+from vocabulary import readCorpus
+
 input_folder = './step3/input'
 output_folder = './step3/output'
+# compiled copies of the lexicons, so they are only parsed again when their source file changes
+lexicon_folder = os.path.join(output_folder, 'lexicons')
+# True to keep the lexicons as packed sorted tables mapped from their compiled copies (see CompactLexicon),
+# for lexicons too big to hold as sets of Python strings
+COMPACT_LEXICONS = False
+# Lexicons too big even for that (e.g. a full KOIN frequency list instead of 30000_KOIN.txt), e.g. ['KOINInd'],
+# are checked through a Bloom filter in front of their compiled copy (see BloomLexicon).
+# The rate is the share of words not in the lexicon that get past the filter to the exact check
+BLOOM_LEXICONS = []
+BLOOM_FALSE_POSITIVE_RATE = 0.01
 
 '''
-Create list of words from system dict/words file
-
-'''
-
-engTokens = []
-with open(os.path.join(input_folder, 'web2'), 'r') as eng_file:
-    for line in eng_file:
-        for word in line.split():
-            engTokens.append(word)
-
-engTokens = [w.lower() for w in engTokens]
-
-
-'''
-Create list of words from CMU pronunciation dictionary
-'''
-
-engCMUTokens = []
-
-with open(os.path.join(input_folder, 'cmudict-0.7b.txt'), 'r', encoding='latin-1') as eng_cmu_file:
-    for line in eng_cmu_file:
-        engCMUTokens.append(line.split()[0])
-
-engCMUTokens = [w.lower() for w in engCMUTokens]
-
-
-'''
-Create list of words from Australian English pronunciation dictionary
-'''
-
-engAusTokens = []
-
-with open(os.path.join(input_folder, 'australian-english-lexicon.txt'), 'r', encoding='latin-1') as eng_aus_file:
-    for line in eng_aus_file:
-        engAusTokens.append(line.split()[0])
-
-engAusTokens = [w.lower() for w in engAusTokens]
-
-
-'''
-Creates a list of English from marked up strings in a csv to be removed
-'''
-
-manEngRemove = []
-
-with open(os.path.join(input_folder, 'remnants_ann.csv'), 'r') as eng_man_file:
-    csvReader = csv.reader(eng_man_file)
-    for row in csvReader:
-        if row[2] == '1':
-            manEngRemove.append(row[0])
-
-
-''' 
-Create lists of words from Bahasa Wordnet .tab file
-'''
-
-wordnetInd = []
-
-with open(os.path.join(input_folder, 'wn-msa-all.tab'), 'r') as wordnet_file:
-    tsvReader = csv.reader(wordnet_file, delimiter='\t')
-    for row in tsvReader:
-        wordnetInd.append(row[3])
-
-wordnetInd = [w.lower() for w in wordnetInd]
-
-# print(wordnetInd[(len(wordnetInd)-2):])
-# print(wordnetInd[0:1])
-
-
-'''
-Create lists of words from CSV of slang Indonesian
-'''
-
-collIndInternet = []
-collIndInternetFormal = []
-
-with open(os.path.join(input_folder, 'colloquial-indonesian-lexicon.csv'), 'r') as coll_ind_file:
-    csvReader = csv.reader(coll_ind_file)
-    for row in csvReader:
-        collIndInternet.append(row[0])
-        collIndInternetFormal.append(row[1])
-
-collIndInternet = [w.lower() for w in collIndInternet]
-collIndInternetFormal = [w.lower() for w in collIndInternetFormal]
-
-
-'''
-Create list of words from Korpus Indonesia
+Load the lexicons, see LEXICONS in lexicons.py for how each source file is read
+Each is a set of lowercased words (apart from the manually marked English in remnants_ann.csv)
 '''
 
-KOINInd = []
-
-with open(os.path.join(input_folder, '30000_KOIN.txt'), 'r') as korpus_ind_file:
-    for line in korpus_ind_file:
-        KOINInd.append(line.split()[1])
-
-KOINInd = [w.lower() for w in KOINInd]
-
-
-'''
-Create list of words from Google Javanese tsv
-'''
-
-googleJav = []
-
-with open(os.path.join(input_folder, 'jav_lexicon.tsv'), 'r') as google_jav_file:
-    tsvReader = csv.reader(google_jav_file, delimiter='\t')
-    for row in tsvReader:
-        if not line:
-            continue
-        googleJav.append(row[0])
-
-googleJav = [w.lower() for w in googleJav]
-
-
-'''
-Create list of words from Google Sundanese tsv
-'''
-
-googleSund = []
-
-with open(os.path.join(input_folder, 'sund_lexicon.tsv'), 'r') as google_sund_file:
-    tsvReader = csv.reader(google_sund_file, delimiter='\t')
-    for row in tsvReader:
-        if not line:
-            continue
-        googleSund.append(row[0])
-
-googleSund = [w.lower() for w in googleSund]
+lexicons = loadLexicons(input_folder, lexicon_folder, compact=COMPACT_LEXICONS, bloom=BLOOM_LEXICONS,
+                        falsePositiveRate=BLOOM_FALSE_POSITIVE_RATE)
 
 
 '''
 Read in the clean teaching resource data
 '''
 
-teachR = []
-
-with open(os.path.join(input_folder, 'manCleanTIW.txt'), 'r') as clean_tiw_file:
-    for line in clean_tiw_file:
-        teachR.append(line.split()[0])
+# held as integer ids into a vocabulary, iterating over it still gives the tokens as strings
+teachR = readCorpus(os.path.join(input_folder, 'manCleanTIW.txt'))
 
 
 '''
 Remove duplicates
 '''
 
-# All wordlists are converted to sets for faster processing to remove any duplicates after lowercase normalisation
+# All wordlists are sets for faster processing, without any duplicates after lowercase normalisation
 
-teachRLex = set(teachR)
+# from the vocabulary, without going over every token
+teachRLex = teachR.types()
 
 # English wordlists
 # engLex can be used early on to shorten the residual list,
 # but contains many Indonesian tokens which should not be removed
-engLex = set(engTokens)
-engCMULex = set(engCMUTokens)
-engAusLex = set(engAusTokens)
-engManualLex = set(manEngRemove)
+engLex = lexicons['eng']
+engCMULex = lexicons['engCMU']
+engAusLex = lexicons['engAus']
+engManualLex = lexicons['engManual']
 
 engManual2 = ['playscript',
               'jungled',
@@ -223,41 +112,47 @@ engManual2 = ['playscript',
               'methodologist']
 engManual2Lex = set(engManual2)
 
-engAllDict = list(engCMULex) + list(engAusLex) + list(engManualLex) + list(engManual2Lex)
-engAllDictLex = set(engAllDict)
+# unions rather than lists of every word, so no word is held more than once
+engAllDictLex = engCMULex | engAusLex | engManualLex | engManual2Lex
 
 removeFromEngList = ['yang', 'aku', 'saya', 'lu', 'gue', 'jawab']
 
-engAll = []
-removedEng = []
-
-for token in engAllDictLex:
-    if token not in removeFromEngList:
-        engAll.append(token)
-    else:
-        removedEng.append(token)
-
-engAllLex = set(engAll)
+removedEng = [token for token in removeFromEngList if token in engAllDictLex]
+engAllLex = engAllDictLex - set(removeFromEngList)
 
 
 # Indonesian wordlists
 
-KOINIndLex = set(KOINInd)
-wordnetIndLex = set(wordnetInd)
-collIndInternetLex = set(collIndInternet)
-collIndInternetFormalLex = set(collIndInternetFormal)
+KOINIndLex = lexicons['KOINInd']
+wordnetIndLex = lexicons['wordnetInd']
+collIndInternetLex = lexicons['collIndInternet']
+collIndInternetFormalLex = lexicons['collIndInternetFormal']
 
 # Other langauges of Indonesian wordlists
-googleJavLex = set(googleJav)
-googleSundLex = set(googleSund)
+googleJavLex = lexicons['googleJav']
+googleSundLex = lexicons['googleSund']
+
+# Which of these wordlists each type of the corpus is in, as one bitmask per type (see lexiconIndex.py),
+# found in a single pass over the types. The removals below are queries on the bitmasks,
+# so another wordlist is one more bit rather than another pass over the corpus
+index = LexiconIndex(teachR, {'eng': engLex,
+                              'engCMU': engCMULex,
+                              'engAus': engAusLex,
+                              'engManual': engManualLex,
+                              'engAll': engAllLex,
+                              'KOINInd': KOINIndLex,
+                              'wordnetInd': wordnetIndLex,
+                              'collIndInternetFormal': collIndInternetFormalLex,
+                              'googleJav': googleJavLex,
+                              'googleSund': googleSundLex})
 
 # Remove English and Indonesian wordlists with more formal tendency
 
-residMinusEng = teachRLex - engAllLex
-residMinusKOIN = residMinusEng - KOINIndLex
-residMinuswordnet = residMinusKOIN - wordnetIndLex
+residMinusEng = index.types(noneOf=['engAll'])
+residMinusKOIN = index.types(noneOf=['engAll', 'KOINInd'])
+residMinuswordnet = index.types(noneOf=['engAll', 'KOINInd', 'wordnetInd'])
 # Creates subset 'Residual Types'
-residMinuscollIndInternetFormal = residMinuswordnet - collIndInternetFormalLex
+residMinuscollIndInternetFormal = index.types(noneOf=['engAll', 'KOINInd', 'wordnetInd', 'collIndInternetFormal'])
 
 len(list(residMinuscollIndInternetFormal))
 
@@ -273,15 +168,16 @@ len(list(residMinuscollIndInternetFormal))
 
 # Staged removal of wordlists
 
-minusEng = teachRLex - engLex
-minus2Eng = teachRLex - engCMULex
-minus3Eng = minus2Eng - engAusLex
-minus4Eng = minus3Eng - engManualLex
-minusAllEng = teachRLex - engAllLex
+englishStages = ['engCMU', 'engAus', 'engManual']
+minusEng = index.types(noneOf=['eng'])
+minus2Eng = index.types(noneOf=englishStages[:1])
+minus3Eng = index.types(noneOf=englishStages[:2])
+minus4Eng = index.types(noneOf=englishStages)
+minusAllEng = index.types(noneOf=['engAll'])
 
-minusInd = minus4Eng - KOINIndLex
-minus2Ind = minusInd - collIndInternetFormalLex
-minus3Ind = minus2Ind - wordnetIndLex
+minusInd = index.types(noneOf=englishStages + ['KOINInd'])
+minus2Ind = index.types(noneOf=englishStages + ['KOINInd', 'collIndInternetFormal'])
+minus3Ind = index.types(noneOf=englishStages + ['KOINInd', 'collIndInternetFormal', 'wordnetInd'])
 
 
 '''
@@ -304,20 +200,13 @@ print(shared)
 
 # Remove English from corpus.
 
-engRemoved = []
-eng = []
-
-for word in teachR:
-    if word not in engAllLex:
-        engRemoved.append(word)
-    else:
-        eng.append(word)
-
-engSet = set(eng)
+# the tokens in corpus order, English ones are only counted
+engRemoved = index.tokens(noneOf=['engAll'])
+engSet = index.types(anyOf=['engAll'])
 
 # % of eng tokens
 
-percenEngTokens = len(eng)/len(teachR)
+percenEngTokens = index.tokenCount(anyOf=['engAll'])/len(teachR)
 
 # % of eng types 
 # does not work - not sure how to write maths in python
@@ -330,17 +219,9 @@ with open(os.path.join(output_folder, 'engSet.txt'), 'w') as outFile:
 
 # Search TIW for Javanese lexical items
 
-javInTIW = []
-
-for word in engRemoved:
-    if word in googleJavLex:
-        javInTIW.append(word)
+javInTIW = index.tokens(allOf=['googleJav'], noneOf=['engAll'])
         
-javInTIWLex = []
-
-for word in minus4Eng:
-    if word in googleJavLex:
-        javInTIWLex.append(word)        
+javInTIWLex = list(index.types(allOf=['googleJav'], noneOf=englishStages))
 
 javInEng = []
 
@@ -358,17 +239,9 @@ for word in javInTIW:
         
 # Search TIW for Sundanese lexical items
 
-sundInTIW = []
-
-for word in engRemoved:
-    if word in googleSundLex:
-        sundInTIW.append(word)
+sundInTIW = index.tokens(allOf=['googleSund'], noneOf=['engAll'])
         
-sundInTIWLex = []
-
-for word in minus4Eng:
-    if word in googleSundLex:
-        sundInTIWLex.append(word)
+sundInTIWLex = list(index.types(allOf=['googleSund'], noneOf=englishStages))
 
 print(sundInTIW[200:300])
 
@@ -413,17 +286,22 @@ c = list(engLex - engCMULex - engAusLex)
 cz = sorted(c)
 print(cz[0:100])
 
-engManualLex = set(manEngRemove)
+engManualLex = lexicons['engManual']
 
 removeFromEngList = ['yang', 'aku', 'saya', 'lu', 'gue']
     
+# How often the Bloom filters let through a word that wasn't in the lexicon
+for name in BLOOM_LEXICONS:
+    print('{}: {}'.format(name, lexicons[name].report()))
+
 
 # Plotting
 
 import nltk
 from nltk import FreqDist
 
-fdist1 = FreqDist(engRemoved)
+# from the type counts, rather than counting engRemoved again
+fdist1 = FreqDist(index.frequencies(noneOf=['engAll']))
 # fdist1
 # fdist1['tidak']
 # fdist1['aku']
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Loads the manual annotation rules for createCleanCorpus
+    manRemnants.csv  - hyphenated strings to split on their hyphens
+    remnants_ann.csv - strings to remove
+Both are turned into frozensets, so checking a token against them takes the same time
+however many strings the annotators have marked. The sets are cached in the output folder,
+keyed by the hash of the two CSVs, so they are only parsed again when a CSV changes
+"""
+
+# ----- LIBRARIES ----- #
+import csv
+import hashlib
+import os
+import pickle
+# ---------------------------------------------------------------------- #
+
+# ----- PRE-DEFINED CONSTANTS ----- #
+
+SPLIT_HYPHEN_FILE = 'manRemnants.csv'
+REMOVE_FILE = 'remnants_ann.csv'
+
+RULES_CACHE_NAME = '.annotationRules.pickle'
+# bump this if the cache layout or the CSV parsing changes, older caches are then ignored
+# (version 2 skips rows too short to have the marked column)
+RULES_VERSION = 2
+
+# ---------------------------------------------------------------------- #
+
+# ----- HELPER FUNCTIONS ----- #
+
+
+def readMarkedStrings(csvPath, column):
+    """
+    Strings in the first column of a csv that have the value 1 in the given column
+    """
+
+    marked = set()
+    with open(csvPath, 'r') as csvFile:
+        csvReader = csv.reader(csvFile)
+        for row in csvReader:
+            # blank or short lines left by editing the CSV by hand
+            if len(row) <= column:
+                continue
+            if row[column] == '1':
+                marked.add(row[0])
+    return frozenset(marked)
+
+# ---------------------------------------------------------------------- #
+
+
+def loadSplitHyphenList(inputFolder):
+    """
+    Split manually marked strings that have a hyphen e.g. 'putih-white
+
+    To manually split files that have a hyphen,
+    include the hyphenated word in the first column of a csv,
+    and value 1 in second column.
+    Returns None if there is no manRemnants.csv in inputFolder
+    """
+
+    remnants_man_path = os.path.join(inputFolder, SPLIT_HYPHEN_FILE)
+    if not os.path.exists(remnants_man_path):
+        print('No manRemnants file found')
+        return None
+    return readMarkedStrings(remnants_man_path, 1)
+
+# ---------------------------------------------------------------------- #
+
+
+def loadRemoveList(inputFolder):
+    """
+    Remove marked up strings from a csv
+
+    To explicitly remove words,
+    make a CSV with words in the first column,
+    and the value 1 in the third column
+    Returns None if there is no remnants_ann.csv in inputFolder
+    """
+
+    remnants_ann_path = os.path.join(inputFolder, REMOVE_FILE)
+    if not os.path.exists(remnants_ann_path):
+        print('No remnants_ann file found')
+        return None
+    return readMarkedStrings(remnants_ann_path, 2)
+
+# ---------------------------------------------------------------------- #
+
+
+def rulesHash(inputFolder):
+    """
+    sha256 over the contents of both CSVs, and which of them are there
+    """
+
+    digest = hashlib.sha256(str(RULES_VERSION).encode())
+    for name in (SPLIT_HYPHEN_FILE, REMOVE_FILE):
+        csvPath = os.path.join(inputFolder, name)
+        if os.path.exists(csvPath):
+            with open(csvPath, 'rb') as csvFile:
+                digest.update(b'1' + hashlib.sha256(csvFile.read()).digest())
+        else:
+            digest.update(b'0')
+    return digest.hexdigest()
+
+# ---------------------------------------------------------------------- #
+
+
+def loadAnnotationRules(inputFolder, cacheFolder=None):
+    """
+    Returns (splitHyphenList, manRemove) as frozensets, either of them None if its CSV isn't in inputFolder
+    If cacheFolder is given, the sets are saved there and loaded from it next time,
+    as long as neither CSV has changed
+    """
+
+    key = rulesHash(inputFolder)
+    cachePath = os.path.join(cacheFolder, RULES_CACHE_NAME) if cacheFolder else None
+
+    if cachePath and os.path.exists(cachePath):
+        try:
+            with open(cachePath, 'rb') as cacheFile:
+                saved = pickle.load(cacheFile)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            saved = None
+        if isinstance(saved, dict) and saved.get('hash') == key:
+            # the missing file messages are still wanted when the rules come from the cache
+            if saved['splitHyphenList'] is None:
+                print('No manRemnants file found')
+            if saved['manRemove'] is None:
+                print('No remnants_ann file found')
+            return saved['splitHyphenList'], saved['manRemove']
+
+    splitHyphenList = loadSplitHyphenList(inputFolder)
+    manRemove = loadRemoveList(inputFolder)
+
+    if cachePath:
+        # written to a temporary file first so an interrupted run can't leave half a cache behind
+        tempPath = cachePath + '.tmp'
+        with open(tempPath, 'wb') as cacheFile:
+            pickle.dump({'hash': key, 'splitHyphenList': splitHyphenList, 'manRemove': manRemove}, cacheFile,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tempPath, cachePath)
+    return splitHyphenList, manRemove
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Checks and times the compiled token cleaner (tokenCleaner.py) against the createCleanCorpus steps
+Generates noisy Zipf distributed text, cleans it with both cleanTokensInSteps and cleanTokens
+(with and without its cache), stops if the tokens or stats differ in any way, then times them
+"""
+
+# ----- LIBRARIES ----- #
+from argparse import ArgumentParser
+from functools import partial
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from createCleanCorpus import cleanTokens, cleanTokensInSteps, newStats
+from tokenCleaner import CACHE_SIZE, characters_to_remove, inValid_tokens, removeFromBetween
+# ---------------------------------------------------------------------- #
+
+# ----- PRE-DEFINED CONSTANTS ----- #
+
+# syllables for made up Indonesian, Javanese and English looking words
+SYLLABLES = ['ba', 'ka', 'ma', 'sa', 'ta', 'ng', 'ny', 'ya', 'da', 'ra', 'la', 'pa', 'ju', 'ke', 'si', 'tu', 'an', 'in',
+             'ber', 'me', 'di', 'ter', 'kan', 'nya', 'lah', 'wa', 'go', 'ing', 'th', 'er', 'ou', 'sh', 'ion', 'é']
+COMMON = ['yang', 'dan', 'di', 'ini', 'itu', 'saya', 'anda', 'tidak', 'dengan', 'untuk', 'the', 'and', 'of', 'to',
+          'sampun', 'kula', 'panjenengan', 'mboten', 'abdi', 'teu']
+HYPHENS = ['-', '–', '—', '―']
+# punctuation that usually ends up next to words, the rest of characters_to_remove turns up now and then
+LEADING = '("“‘¿'
+TRAILING = '.,.,.,?!:;)"”’'
+
+# ---------------------------------------------------------------------- #
+
+# ----- HELPER FUNCTIONS ----- #
+
+
+def makeVocabulary(randomiser, types):
+    """
+    A list of distinct made up words, most frequent first
+    """
+
+    vocabulary = list(COMMON)
+    seen = set(vocabulary)
+    while len(vocabulary) < types:
+        word = ''.join(randomiser.choice(SYLLABLES) for _ in range(randomiser.randint(1, 4)))
+        if word not in seen:
+            seen.add(word)
+            vocabulary.append(word)
+    return vocabulary
+
+# ---------------------------------------------------------------------- #
+
+
+def addNoise(randomiser, word):
+    """
+    Messes a word up the ways teaching resources do:
+    punctuation around and inside it, capitals, reduplication, numbers and stray letters
+    """
+
+    roll = randomiser.random()
+    if roll < 0.05:
+        # exercise numbers like 3-4, or plain numerals
+        return randomiser.choice(['{}-{}', '{}.{}', '{}']).format(randomiser.randint(1, 20), randomiser.randint(1, 9))
+    if roll < 0.08:
+        # stray single letters, from lists like a) b) c)
+        return randomiser.choice('abcdefghijklmnopqrstuvwxyz') + randomiser.choice(['', ')', '.'])
+    if roll < 0.09:
+        return randomiser.choice(inValid_tokens)
+    if roll < 0.14:
+        # reduplication, which is how Indonesian makes plurals
+        word = word + randomiser.choice(HYPHENS) + word
+    if roll < 0.2:
+        word = word + randomiser.choice(removeFromBetween) + randomiser.choice(COMMON)
+    if roll < 0.21:
+        # footnote and exercise markers stuck to words
+        word = word + str(randomiser.randint(1, 9))
+    if randomiser.random() < 0.1:
+        word = word.capitalize()
+    if randomiser.random() < 0.05:
+        word = randomiser.choice(LEADING if randomiser.random() < 0.9 else characters_to_remove) + word
+    if randomiser.random() < 0.15:
+        word = word + randomiser.choice(TRAILING if randomiser.random() < 0.9 else characters_to_remove)
+    return word
+
+# ---------------------------------------------------------------------- #
+
+
+def makeWords(count, types=50000, seed=0):
+    """
+    Yields count noisy words drawn from a Zipf distribution over types made up words
+    """
+
+    randomiser = random.Random(seed)
+    vocabulary = makeVocabulary(randomiser, types)
+    # Zipf: the word at rank r turns up in proportion to 1 / r
+    weights = [1 / rank for rank in range(1, types + 1)]
+    cumulative = []
+    total = 0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+
+    # draw in blocks, random.choices is much faster per word that way
+    while count > 0:
+        block = min(count, 10000)
+        for word in randomiser.choices(vocabulary, cum_weights=cumulative, k=block):
+            yield addNoise(randomiser, word)
+        count -= block
+
+# ---------------------------------------------------------------------- #
+
+
+def makeManualLists(words):
+    """
+    Marks some of the hyphenated and common tokens for splitting and removal, like annotators would
+    """
+
+    hyphenated = sorted(set(word.lower() for word in words if '-' in word and word.isascii()))
+    splitHyphenList = hyphenated[::3]
+    manRemove = ['dan', 'teu'] + [word.split('-')[0] for word in hyphenated[1::7]]
+    return splitHyphenList, manRemove
+
+# ---------------------------------------------------------------------- #
+
+
+def timeCleaner(cleaner, words, splitHyphenList, manRemove, repeat):
+    """
+    Best time out of repeat runs to clean every word
+    Returns (seconds, stats of the last run)
+    """
+
+    best = None
+    for _ in range(repeat):
+        stats = newStats()
+        start = time.perf_counter()
+        for _ in cleaner(iter(words), stats, splitHyphenList, manRemove):
+            pass
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, stats
+
+# ---------------------------------------------------------------------- #
+
+# ----- MAIN FUNCTION ----- #
+
+
+def main():
+    parser = ArgumentParser(description="Checks the compiled cleaner gives the same tokens as the cleaning steps, "
+                                        "and times them.")
+    parser.add_argument('--tokens', help='Number of words to generate', type=int, default=200000)
+    parser.add_argument('--repeat', help='Number of times to time each cleaner', type=int, default=3)
+    parser.add_argument('--seed', help='Seed for the generated text', type=int, default=0)
+    parser.add_argument('--cache-size', help='Cache size for the cached cleaner', type=int, default=CACHE_SIZE)
+    args = parser.parse_args()
+
+    words = list(makeWords(args.tokens, seed=args.seed))
+    splitHyphenList, manRemove = makeManualLists(words)
+    cleaners = [('steps', cleanTokensInSteps),
+                ('compiled', partial(cleanTokens, cacheSize=0)),
+                ('compiled + cache', partial(cleanTokens, cacheSize=args.cache_size))]
+
+    # same tokens and stats, with and without the manual lists
+    for lists in ((None, None), (splitHyphenList, manRemove)):
+        stepStats = newStats()
+        stepTokens = list(cleanTokensInSteps(iter(words), stepStats, *lists))
+        for name, cleaner in cleaners[1:]:
+            compiledStats = newStats()
+            compiledTokens = list(cleaner(iter(words), compiledStats, *lists))
+            # the steps have no cache to count
+            for count in ('cacheHits', 'cacheMisses'):
+                compiledStats['counts'].pop(count, None)
+            if stepTokens != compiledTokens:
+                index = next((index for index, (a, b) in enumerate(zip(stepTokens, compiledTokens)) if a != b),
+                             min(len(stepTokens), len(compiledTokens)))
+                sys.exit(f"{name}: tokens differ at {index}: "
+                         f"{stepTokens[index:index + 5]} vs {compiledTokens[index:index + 5]}")
+            if stepStats != compiledStats:
+                sys.exit(f"{name}: stats differ: "
+                         f"{[counter for counter in stepStats if stepStats[counter] != compiledStats[counter]]}")
+    print(f"Same tokens and stats for {len(words)} words ({len(stepTokens)} tokens out)")
+
+    print(f"{'cleaner':<20}{'seconds':>10}{'words/s':>14}{'speed up':>10}")
+    stepSeconds = None
+    for name, cleaner in cleaners:
+        seconds, stats = timeCleaner(cleaner, words, splitHyphenList, manRemove, args.repeat)
+        stepSeconds = stepSeconds or seconds
+        print(f"{name:<20}{seconds:>10.3f}{len(words) / seconds:>14,.0f}{stepSeconds / seconds:>9.1f}x")
+    hits = stats['counts']['cacheHits']
+    misses = stats['counts']['cacheMisses']
+    print(f"cache: {hits} hits, {misses} misses ({hits / max(1, hits + misses):.1%} hit rate), "
+          f"{len(set(words))} distinct words")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark for the step1 conversion path (convertToText.py)
+Generates a synthetic corpus of text PDFs, image-only PDFs, .docx files and PNG scans,
+then runs readWithFormatting and readWithNoFormatting over it and reports
+files/s, pages/s, MB/s and peak RSS as JSON, so runs can be compared between changes.
+Everything is generated locally: the PDFs and .docx files are written by hand,
+and the scans are rendered with pdftoppm (from poppler, which convertToText needs anyway)
+"""
+
+# ----- LIBRARIES ----- #
+from argparse import ArgumentParser, SUPPRESS
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+import zlib
+
+ZMS_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ZMS_FOLDER)
+# ---------------------------------------------------------------------- #
+
+# ----- PRE-DEFINED CONSTANTS ----- #
+
+WORDS = ['saya', 'makan', 'nasi', 'yang', 'dan', 'tidak', 'belajar', 'bahasa', 'Indonesia', 'guru', 'murid',
+         'sekolah', 'rumah', 'pergi', 'ke', 'pasar', 'the', 'teacher', 'student', 'reads', 'office', 'flow',
+         'exercise', 'answer', 'question', 'kelas', 'buku', 'anak-anak', 'bersiap-siap', 'latihan']
+PUNCTUATION = ['', '', '', '', '.', ',', '?', '!', ':', ';']
+
+# resolution the scans are rendered at, OCR needs something reasonably sharp
+SCAN_RESOLUTION = 150
+
+MODES = ['formatting', 'no-formatting']
+
+# ---------------------------------------------------------------------- #
+
+# ----- CORPUS GENERATION ----- #
+
+
+def makeLines(randomiser, words, wordsPerLine=10):
+    """
+    Random teaching-resource-like text, as a list of lines
+    """
+
+    lines = []
+    line = []
+    for _ in range(words):
+        line.append(randomiser.choice(WORDS) + randomiser.choice(PUNCTUATION))
+        if len(line) == wordsPerLine:
+            lines.append(' '.join(line))
+            line = []
+    if line:
+        lines.append(' '.join(line))
+    return lines
+
+# ---------------------------------------------------------------------- #
+
+
+def escapePDFText(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+# ---------------------------------------------------------------------- #
+
+
+def writePDF(path, pages):
+    """
+    Writes a minimal PDF by hand
+    Each page is either a list of lines (a text page)
+    or a (width, height, grey pixels) tuple (an image-only page filling the whole page)
+    """
+
+    objects = []
+
+    def addObject(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = addObject(None)
+    pageTree = addObject(None)
+    font = addObject(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+    pageObjects = []
+
+    for page in pages:
+        if isinstance(page, tuple):
+            width, height, pixels = page
+            data = zlib.compress(pixels)
+            image = addObject(b'<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray '
+                              b'/BitsPerComponent 8 /Filter /FlateDecode /Length %d >>\nstream\n'
+                              % (width, height, len(data)) + data + b'\nendstream')
+            content = b'q 612 0 0 792 0 0 cm /Im1 Do Q'
+            resources = b'<< /XObject << /Im1 %d 0 R >> >>' % image
+        else:
+            text = ''.join('({}) Tj T* '.format(escapePDFText(line)) for line in page)
+            content = ('BT /F1 11 Tf 14 TL 56 760 Td ' + text + 'ET').encode('latin-1')
+            resources = b'<< /Font << /F1 %d 0 R >> >>' % font
+        stream = addObject(b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream')
+        pageObjects.append(addObject(b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Resources '
+                                     % pageTree + resources + b' /Contents %d 0 R >>' % stream))
+
+    objects[catalog - 1] = b'<< /Type /Catalog /Pages %d 0 R >>' % pageTree
+    objects[pageTree - 1] = (b'<< /Type /Pages /Kids [' + b' '.join(b'%d 0 R' % number for number in pageObjects)
+                             + b'] /Count %d >>' % len(pageObjects))
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        output += b'%010d 00000 n \n' % offset
+    output += b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, catalog, xref)
+
+    with open(path, 'wb') as pdf_file:
+        pdf_file.write(output)
+
+# ---------------------------------------------------------------------- #
+
+
+def readPGM(path):
+    """
+    Reads a binary greyscale PGM as written by pdftoppm -gray
+    Returns (width, height, pixels)
+    """
+
+    with open(path, 'rb') as pgm_file:
+        data = pgm_file.read()
+    # header is: P5, width, height, maximum value, each separated by white space
+    fields = []
+    position = 0
+    while len(fields) < 4:
+        while data[position:position + 1].isspace():
+            position += 1
+        start = position
+        while not data[position:position + 1].isspace():
+            position += 1
+        fields.append(data[start:position])
+    # a single white space character separates the header from the pixels
+    return int(fields[1]), int(fields[2]), data[position + 1:]
+
+# ---------------------------------------------------------------------- #
+
+
+def renderPages(pdfPath, prefix, imageType):
+    """
+    Renders every page of a PDF with pdftoppm, returns the image paths in page order
+    """
+
+    subprocess.run(['pdftoppm', '-r', str(SCAN_RESOLUTION), imageType, pdfPath, prefix],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    folder, name = os.path.split(prefix)
+    return sorted(os.path.join(folder, entry) for entry in os.listdir(folder)
+                  if entry.startswith(name + '-'))
+
+# ---------------------------------------------------------------------- #
+
+
+def writeDocx(path, lines):
+    """
+    Writes a minimal .docx with one paragraph per line
+    """
+
+    paragraphs = ''.join('<w:p><w:r><w:t xml:space="preserve">{}</w:t></w:r></w:p>'.format(
+        line.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')) for line in lines)
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as docx_file:
+        docx_file.writestr('[Content_Types].xml',
+                           '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                           '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                           '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                           '<Default Extension="xml" ContentType="application/xml"/>'
+                           '<Override PartName="/word/document.xml" ContentType="application/'
+                           'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>')
+        docx_file.writestr('_rels/.rels',
+                           '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                           '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                           '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+                           'relationships/officeDocument" Target="word/document.xml"/></Relationships>')
+        docx_file.writestr('word/document.xml',
+                           '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                           '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+                           'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                           '<w:body>' + paragraphs + '</w:body></w:document>')
+
+# ---------------------------------------------------------------------- #
+
+
+def generateCorpus(inputFolder, filesPerType, pagesPerPDF, wordsPerPage, seed=0):
+    """
+    Fills inputFolder with filesPerType text PDFs, image-only PDFs, .docx files and PNG scans
+    Returns the number of pages in the corpus, counting each .docx and PNG as one page
+    """
+
+    randomiser = random.Random(seed)
+    pages = 0
+
+    with tempfile.TemporaryDirectory() as workFolder:
+        for number in range(filesPerType):
+            textPages = [makeLines(randomiser, wordsPerPage) for _ in range(pagesPerPDF)]
+
+            # a PDF with a text layer
+            textPDF = os.path.join(inputFolder, 'text', 'text-{:04d}.pdf'.format(number))
+            os.makedirs(os.path.dirname(textPDF), exist_ok=True)
+            writePDF(textPDF, textPages)
+            pages += pagesPerPDF
+
+            # the same pages scanned, i.e. a PDF of images with no text layer
+            prefix = os.path.join(workFolder, 'scan{}'.format(number))
+            images = [readPGM(image) for image in renderPages(textPDF, prefix, '-gray')]
+            scannedPDF = os.path.join(inputFolder, 'scanned', 'scanned-{:04d}.pdf'.format(number))
+            os.makedirs(os.path.dirname(scannedPDF), exist_ok=True)
+            writePDF(scannedPDF, images)
+            pages += pagesPerPDF
+
+            # a word document
+            docx = os.path.join(inputFolder, 'docx', 'docx-{:04d}.docx'.format(number))
+            os.makedirs(os.path.dirname(docx), exist_ok=True)
+            writeDocx(docx, makeLines(randomiser, wordsPerPage))
+            pages += 1
+
+            # a single page scan
+            onePage = os.path.join(workFolder, 'page{}.pdf'.format(number))
+            writePDF(onePage, [makeLines(randomiser, wordsPerPage)])
+            png = os.path.join(inputFolder, 'png', 'scan-{:04d}.png'.format(number))
+            os.makedirs(os.path.dirname(png), exist_ok=True)
+            os.replace(renderPages(onePage, os.path.join(workFolder, 'png{}'.format(number)), '-png')[0], png)
+            pages += 1
+
+    return pages
+
+# ---------------------------------------------------------------------- #
+
+# ----- BENCHMARK ----- #
+
+
+def runMode(mode, inputFolder, outputFolder, resultFile):
+    """
+    Runs in its own process, so its peak RSS can be measured on its own
+    Converts the corpus with one of the read functions and writes the time taken to resultFile
+    """
+
+    from fileDiscovery import listOfFiles
+    import convertToText
+
+    files = listOfFiles(inputFolder)
+    start = time.perf_counter()
+    if mode == 'formatting':
+        convertToText.readWithFormatting(files, inputFolder, outputFolder)
+    else:
+        convertToText.readWithNoFormatting(files, inputFolder, outputFolder)
+    seconds = time.perf_counter() - start
+
+    with open(resultFile, 'w') as result_file:
+        json.dump({'seconds': seconds}, result_file)
+
+# ---------------------------------------------------------------------- #
+
+
+def benchmarkMode(mode, inputFolder, workFolder, files, pages, inputBytes):
+    """
+    Runs one mode in a child process and works out its throughput and peak RSS
+    """
+
+    outputFolder = os.path.join(workFolder, 'output-' + mode)
+    os.makedirs(outputFolder, exist_ok=True)
+    resultFile = os.path.join(workFolder, 'result-{}.json'.format(mode))
+
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--run-mode', mode,
+                                '--input', inputFolder, '--output', outputFolder, '--result', resultFile],
+                               stdout=subprocess.DEVNULL)
+    # wait4 gives the resource usage of this child alone, including the tools it ran
+    _, status, usage = os.wait4(process.pid, 0)
+    if status != 0:
+        sys.exit('{} run failed'.format(mode))
+
+    with open(resultFile, 'r') as result_file:
+        seconds = json.load(result_file)['seconds']
+
+    return {'mode': mode,
+            'seconds': round(seconds, 3),
+            'files_per_s': round(files / seconds, 3),
+            'pages_per_s': round(pages / seconds, 3),
+            'mb_per_s': round(inputBytes / 1e6 / seconds, 3),
+            # ru_maxrss is in kilobytes on Linux
+            'peak_rss_mb': round(usage.ru_maxrss / 1024, 1)}
+
+# ---------------------------------------------------------------------- #
+
+# ----- MAIN FUNCTION ----- #
+
+
+def main():
+    parser = ArgumentParser(description="Benchmarks convertToText on a generated corpus and prints the results as JSON.")
+    parser.add_argument('--files', help='Number of files of each type to generate', type=int, default=5)
+    parser.add_argument('--pages', help='Pages per PDF', type=int, default=4)
+    parser.add_argument('--words', help='Words per page', type=int, default=300)
+    parser.add_argument('--modes', help='Which read functions to run', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--keep', help='Keep the generated corpus in this folder instead of a temporary one')
+    parser.add_argument('--json', help='Also write the results to this file')
+    # used internally to run a single mode in a child process
+    parser.add_argument('--run-mode', choices=MODES, help=SUPPRESS)
+    parser.add_argument('--input', help=SUPPRESS)
+    parser.add_argument('--output', help=SUPPRESS)
+    parser.add_argument('--result', help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        runMode(args.run_mode, args.input, args.output, args.result)
+        return
+
+    with tempfile.TemporaryDirectory() as temporaryFolder:
+        workFolder = args.keep or temporaryFolder
+        inputFolder = os.path.join(workFolder, 'input')
+        os.makedirs(inputFolder, exist_ok=True)
+
+        pages = generateCorpus(inputFolder, args.files, args.pages, args.words)
+        files = 4 * args.files
+        inputBytes = sum(os.path.getsize(os.path.join(folder, name))
+                         for folder, _, names in os.walk(inputFolder) for name in names)
+
+        results = {'corpus': {'files': files, 'pages': pages, 'bytes': inputBytes,
+                              'files_per_type': args.files, 'pages_per_pdf': args.pages,
+                              'words_per_page': args.words},
+                   'runs': [benchmarkMode(mode, inputFolder, workFolder, files, pages, inputBytes)
+                            for mode in args.modes]}
+
+    print(json.dumps(results, indent=1))
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark for how the step2 cleaning (createCleanCorpus.py) scales with the size of the corpus
+Generates noisy Zipf distributed multilingual text at a few sizes (1M, 10M and 100M tokens by default),
+with the punctuation, exercise numbers, reduplications and stray letters of teaching resources,
+and annotation CSVs like an annotator would make. Then runs createCleanCorpus.py on each
+in its own process and reports tokens/s and peak RSS per size as JSON
+"""
+
+# ----- LIBRARIES ----- #
+from argparse import ArgumentParser
+import csv
+import json
+import os
+import random
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+ZMS_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ZMS_FOLDER)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchCleaner import makeManualLists, makeWords
+# ---------------------------------------------------------------------- #
+
+# ----- PRE-DEFINED CONSTANTS ----- #
+
+SIZES = [1, 10, 100]
+
+# the corpus is split into files of this many tokens, like a folder of extracted documents
+TOKENS_PER_FILE = 2000000
+
+# words the annotation CSVs are made from
+SAMPLE_SIZE = 200000
+
+# ---------------------------------------------------------------------- #
+
+# ----- CORPUS GENERATION ----- #
+
+
+def vocabularySize(tokens):
+    """
+    Number of distinct words in a corpus of this many tokens, by Heaps' law
+    """
+
+    return int(10 * tokens ** 0.6)
+
+# ---------------------------------------------------------------------- #
+
+
+def generateCorpus(inputFolder, tokens, seed=0):
+    """
+    Writes tokens noisy words into .txt files in inputFolder, 3 to 12 words to a line,
+    plus manRemnants.csv and remnants_ann.csv marking some of the words
+    Returns the number of distinct words written, which is only about vocabularySize(tokens)
+    """
+
+    randomiser = random.Random(seed)
+    words = makeWords(tokens, types=vocabularySize(tokens), seed=seed)
+    types = set()
+    sample = []
+    written = 0
+    number = 0
+    while written < tokens:
+        fileTokens = min(TOKENS_PER_FILE, tokens - written)
+        with open(os.path.join(inputFolder, 'doc{:04d}.txt'.format(number)), 'w') as outFile:
+            left = fileTokens
+            while left > 0:
+                line = [next(words) for _ in range(min(left, randomiser.randint(3, 12)))]
+                types.update(line)
+                if len(sample) < SAMPLE_SIZE:
+                    sample.extend(line)
+                outFile.write(' '.join(line) + '\n')
+                left -= len(line)
+        written += fileTokens
+        number += 1
+
+    splitHyphenList, manRemove = makeManualLists(sample)
+    # the words can have commas and quotes in them, so let csv quote them
+    with open(os.path.join(inputFolder, 'manRemnants.csv'), 'w', newline='') as csvFile:
+        csv.writer(csvFile).writerows([word, '1', ''] for word in splitHyphenList)
+    with open(os.path.join(inputFolder, 'remnants_ann.csv'), 'w', newline='') as csvFile:
+        csv.writer(csvFile).writerows([word, '', '1'] for word in manRemove)
+
+    return len(types)
+
+# ---------------------------------------------------------------------- #
+
+
+def corpusFolder(dataFolder, tokens, seed):
+    """
+    Generates the corpus of this size in dataFolder, unless it is already there from an earlier run
+    Returns (inputFolder, number of distinct words in it), the count is kept in the .done file
+    """
+
+    inputFolder = os.path.join(dataFolder, '{}-tokens-seed-{}'.format(tokens, seed))
+    doneFile = os.path.join(inputFolder, '.done')
+    try:
+        with open(doneFile, 'r') as done_file:
+            return inputFolder, json.load(done_file)['types']
+    # not generated yet, or by an older version of this script that didn't count the words
+    except (OSError, ValueError, KeyError):
+        pass
+
+    os.makedirs(inputFolder, exist_ok=True)
+    print('Generating {:,} tokens in {}'.format(tokens, inputFolder), file=sys.stderr)
+    types = generateCorpus(inputFolder, tokens, seed)
+    with open(doneFile, 'w') as done_file:
+        json.dump({'types': types}, done_file)
+    return inputFolder, types
+
+# ---------------------------------------------------------------------- #
+
+# ----- BENCHMARK ----- #
+
+
+def benchmarkSize(inputFolder, outputFolder, tokens, types, options):
+    """
+    Runs createCleanCorpus.py on one corpus in a child process and works out its throughput and peak RSS
+    """
+
+    inputBytes = sum(os.path.getsize(os.path.join(inputFolder, name)) for name in os.listdir(inputFolder))
+    command = [sys.executable, os.path.join(ZMS_FOLDER, 'createCleanCorpus.py'),
+               '-i', inputFolder, '-o', outputFolder] + options
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    # wait4 gives the resource usage of this child alone, including any workers it started
+    _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start
+    if status != 0:
+        sys.exit('createCleanCorpus.py failed on {}'.format(inputFolder))
+
+    return {'tokens': tokens,
+            'types': types,
+            # the vocabulary size the corpus was generated for
+            'target_types': vocabularySize(tokens),
+            'input_mb': round(inputBytes / 1e6, 1),
+            'seconds': round(seconds, 3),
+            'tokens_per_s': round(tokens / seconds),
+            'mb_per_s': round(inputBytes / 1e6 / seconds, 3),
+            # ru_maxrss is in kilobytes on Linux, and is the biggest single process for a pool of workers
+            'peak_rss_mb': round(usage.ru_maxrss / 1024, 1),
+            'output_mb': round(os.path.getsize(os.path.join(outputFolder, 'manCleanTIW.txt')) / 1e6, 1)}
+
+# ---------------------------------------------------------------------- #
+
+# ----- MAIN FUNCTION ----- #
+
+
+def main():
+    parser = ArgumentParser(description="Benchmarks createCleanCorpus on generated corpora of growing size "
+                                        "and prints the results as JSON.")
+    parser.add_argument('--sizes', help='Corpus sizes in millions of tokens', type=float, nargs='+', default=SIZES)
+    parser.add_argument('--seed', help='Seed for the generated text', type=int, default=0)
+    parser.add_argument('--options', help='Options to run createCleanCorpus.py with, e.g. "-j 4 --mmap"', default='')
+    parser.add_argument('--data', help='Keep the generated corpora in this folder and use them again next time')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    options = shlex.split(args.options)
+    results = {'options': options, 'runs': []}
+    with tempfile.TemporaryDirectory() as temporaryFolder:
+        dataFolder = args.data or temporaryFolder
+        for size in args.sizes:
+            tokens = int(size * 1000000)
+            inputFolder, types = corpusFolder(dataFolder, tokens, args.seed)
+            outputFolder = os.path.join(temporaryFolder, 'output-{}'.format(tokens))
+            result = benchmarkSize(inputFolder, outputFolder, tokens, types, options)
+            print('{:,} tokens: {:,} tokens/s, {} MB peak'.format(tokens, result['tokens_per_s'],
+                                                                  result['peak_rss_mb']), file=sys.stderr)
+            results['runs'].append(result)
+
+    print(json.dumps(results, indent=1))
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=1)
+
+
+if __name__ == '__main__':
+    main()
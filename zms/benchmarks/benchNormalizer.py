@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+"""
+Micro-benchmark of the compiled text normaliser against the chain of
+re.sub/translate calls convertToText used before
+Checks both give exactly the same text before timing them
+"""
+
+# ----- LIBRARIES ----- #
+from argparse import ArgumentParser
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from textNormalizer import LIGATURES, compileNormalizer
+# ---------------------------------------------------------------------- #
+
+# ----- PRE-DEFINED CONSTANTS ----- #
+
+WORDS = ['saya', 'makan', 'nasi', 'yang', 'dan', 'tidak', 'the', 'of', 'and', 'teacher', 'office', 'flow']
+# things PDFs and scans tend to leave in the text
+NOISE = ['“', '”', '‘', '’', '…', '•', '(', ')', '.', ',', '!', '?', '-', '–', ':', ';', '',
+         'ﬁ', 'ﬂ', 'ﬀ', '\x0c', '\x85', '\x8d']
+
+# ---------------------------------------------------------------------- #
+
+# ----- HELPER FUNCTIONS ----- #
+
+
+def makeDocument(size, noise, seed=0):
+    """
+    Builds a document of roughly size characters where noise is the share of words
+    that have punctuation, ligatures or control characters stuck to them
+    """
+
+    randomiser = random.Random(seed)
+    words = []
+    length = 0
+    while length < size:
+        word = randomiser.choice(WORDS)
+        if randomiser.random() < noise:
+            word = randomiser.choice(NOISE) + word + randomiser.choice(NOISE)
+        separator = randomiser.choice([' '] * 12 + ['\n', '\n\n', '\n\n\n'])
+        words.append(word + separator)
+        length += len(word) + len(separator)
+    return ''.join(words)
+
+# ---------------------------------------------------------------------- #
+
+
+def oldFormatted(doc):
+    return doc.translate(LIGATURES)
+
+
+def oldWordDocument(doc):
+    doc = re.sub(r'\n\n*', '\n', doc)
+    return doc.translate(LIGATURES)
+
+
+def oldUnformatted(doc):
+    doc = re.sub(r'[^\w\s]', '', doc)
+    doc = re.sub(r'\n\n*', '\n', doc)
+    return doc.translate(LIGATURES)
+
+# ---------------------------------------------------------------------- #
+
+
+def bestTime(function, doc, repeat):
+    """
+    Fastest of repeat runs, in seconds
+    """
+
+    return min(timeit.repeat(lambda: function(doc), number=1, repeat=repeat))
+
+# ---------------------------------------------------------------------- #
+
+# ----- MAIN FUNCTION ----- #
+
+
+def main():
+    parser = ArgumentParser(description="Times the compiled text normaliser against the old re.sub/translate chain.")
+    parser.add_argument('--size', help='Characters per document', type=int, default=1000000)
+    parser.add_argument('--repeat', help='Number of timing runs, the fastest is kept', type=int, default=5)
+    args = parser.parse_args()
+
+    normalizers = [('formatted', oldFormatted, compileNormalizer(LIGATURES)),
+                   ('word document', oldWordDocument, compileNormalizer(LIGATURES, collapseNewlines=True)),
+                   ('unformatted', oldUnformatted,
+                    compileNormalizer(LIGATURES, stripPunctuation=True, collapseNewlines=True))]
+    documents = [('plain ascii', makeDocument(args.size, 0.0)),
+                 ('light noise', makeDocument(args.size, 0.05)),
+                 ('heavy noise', makeDocument(args.size, 0.5))]
+
+    print(f"{'rules':<15}{'document':<13}{'chain ms':>10}{'compiled ms':>13}{'speed up':>10}")
+    for rulesName, old, new in normalizers:
+        for documentName, doc in documents:
+            if old(doc) != new(doc):
+                sys.exit(f"{rulesName} normaliser gives different text on the {documentName} document")
+            oldSeconds = bestTime(old, doc, args.repeat)
+            newSeconds = bestTime(new, doc, args.repeat)
+            print(f"{rulesName:<15}{documentName:<13}{oldSeconds * 1000:>10.2f}{newSeconds * 1000:>13.2f}"
+                  f"{oldSeconds / newSeconds:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
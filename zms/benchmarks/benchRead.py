@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Times reading step2 input text with readWords (line by line) and readWordsMapped (memory mapped batches)
+Writes a text file of noisy Zipf distributed words, checks both readers give the same words,
+then times reading on its own and reading with cleaning
+"""
+
+# ----- LIBRARIES ----- #
+from argparse import ArgumentParser
+from collections import deque
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchCleaner import makeWords
+from createCleanCorpus import applyCleaner, newStats, readWords, readWordsMapped
+from tokenCleaner import compileCleaner
+# ---------------------------------------------------------------------- #
+
+# ----- HELPER FUNCTIONS ----- #
+
+
+def writeText(textFile, megabytes, seed=0):
+    """
+    Writes about megabytes MB of noisy words, a few to a dozen words to a line like extracted text
+    """
+
+    randomiser = random.Random(seed)
+    size = megabytes << 20
+    written = 0
+    words = makeWords(size, seed=seed)
+    with open(textFile, 'w') as outFile:
+        while written < size:
+            line = ' '.join(next(words) for _ in range(randomiser.randint(3, 12))) + '\n'
+            outFile.write(line)
+            written += len(line.encode())
+
+# ---------------------------------------------------------------------- #
+
+
+def timeRead(reader, textFile, repeat, clean=None):
+    """
+    Best time out of repeat runs to read every word of textFile, and clean it if clean is given
+    """
+
+    best = None
+    for _ in range(repeat):
+        stats = newStats()
+        start = time.perf_counter()
+        words = reader([textFile], stats)
+        if clean is not None:
+            words = applyCleaner(words, stats, clean)
+        # run through the words without keeping them
+        deque(words, maxlen=0)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, stats['counts']['words']
+
+# ---------------------------------------------------------------------- #
+
+# ----- MAIN FUNCTION ----- #
+
+
+def main():
+    parser = ArgumentParser(description="Checks readWordsMapped gives the same words as readWords, and times them.")
+    parser.add_argument('--mb', help='Size of the generated text file in MB', type=int, default=64)
+    parser.add_argument('--repeat', help='Number of times to time each reader', type=int, default=3)
+    parser.add_argument('--seed', help='Seed for the generated text', type=int, default=0)
+    args = parser.parse_args()
+
+    readers = [('readWords', readWords), ('readWordsMapped', readWordsMapped)]
+    with tempfile.TemporaryDirectory() as folder:
+        textFile = os.path.join(folder, 'input.txt')
+        writeText(textFile, args.mb, args.seed)
+        megabytes = os.path.getsize(textFile) / (1 << 20)
+
+        # readers print the file they are on, which would swamp the table
+        stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+        try:
+            if list(readWords([textFile], newStats())) != list(readWordsMapped([textFile], newStats())):
+                sys.exit('readWordsMapped gives different words to readWords')
+
+            results = []
+            for clean in (None, compileCleaner(cacheSize=1 << 16)):
+                for name, reader in readers:
+                    seconds, words = timeRead(reader, textFile, args.repeat, clean)
+                    results.append((name + (' + clean' if clean else ''), seconds, words))
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    print(f"Same words from both readers ({words} words, {megabytes:.1f} MB)")
+    print(f"{'reader':<26}{'seconds':>10}{'MB/s':>10}{'words/s':>14}{'speed up':>10}")
+    for index, (name, seconds, words) in enumerate(results):
+        baseline = results[index - index % len(readers)][1]
+        print(f"{name:<26}{seconds:>10.3f}{megabytes / seconds:>10.1f}{words / seconds:>14,.0f}"
+              f"{baseline / seconds:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark for how long convertToText.py takes to start
+Times `convertToText.py --help` and a bare `import convertToText` over a number of runs,
+and lists the modules that take longest to import according to python -X importtime.
+Prints the results as JSON, so runs can be compared between changes
+"""
+
+# ----- LIBRARIES ----- #
+from argparse import ArgumentParser
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+# ---------------------------------------------------------------------- #
+
+# ----- PRE-DEFINED CONSTANTS ----- #
+
+ZMS_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ZMS_FOLDER, 'convertToText.py')
+
+# ---------------------------------------------------------------------- #
+
+# ----- HELPER FUNCTIONS ----- #
+
+
+def timeCommand(command, runs):
+    """
+    Runs a command runs times and returns the wall clock time of each run in milliseconds
+    """
+
+    # the zms folder has to be importable for the bare import
+    environment = dict(os.environ)
+    environment['PYTHONPATH'] = os.pathsep.join(filter(None, [ZMS_FOLDER, environment.get('PYTHONPATH')]))
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=environment)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+# ---------------------------------------------------------------------- #
+
+
+def summarise(timings):
+    return {'min_ms': round(min(timings), 1),
+            'median_ms': round(statistics.median(timings), 1),
+            'max_ms': round(max(timings), 1)}
+
+# ---------------------------------------------------------------------- #
+
+
+def slowestImports(top):
+    """
+    Runs convertToText.py --help under -X importtime
+    Returns the top modules by cumulative import time, only counting modules imported directly by the script
+    """
+
+    result = subprocess.run([sys.executable, '-X', 'importtime', SCRIPT, '--help'],
+                            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    imports = []
+    for line in result.stderr.decode('utf-8').splitlines():
+        # lines look like: import time:   self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # nested imports are indented, keep the ones the script itself asked for
+        if name.startswith(' ') and not name.startswith('  '):
+            imports.append({'module': name.strip(), 'cumulative_ms': round(int(cumulative) / 1000, 1)})
+
+    return sorted(imports, key=lambda entry: entry['cumulative_ms'], reverse=True)[:top]
+
+# ---------------------------------------------------------------------- #
+
+# ----- MAIN FUNCTION ----- #
+
+
+def main():
+    parser = ArgumentParser(description="Times how long convertToText.py takes to start and prints the results as JSON.")
+    parser.add_argument('--runs', help='Number of times to run each command', type=int, default=20)
+    parser.add_argument('--top', help='Number of slowest imports to list', type=int, default=10)
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    results = {'python': sys.executable,
+               'runs': args.runs,
+               # the cost of starting python at all, for reference
+               'python_startup': summarise(timeCommand([sys.executable, '-c', 'pass'], args.runs)),
+               'help': summarise(timeCommand([sys.executable, SCRIPT, '--help'], args.runs)),
+               'import': summarise(timeCommand([sys.executable, '-c', 'import convertToText'], args.runs)),
+               'slowest_imports': slowestImports(args.top)}
+
+    print(json.dumps(results, indent=1))
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=1)
+
+
+if __name__ == '__main__':
+    main()
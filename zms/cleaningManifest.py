@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+"""
+Keeps track of which files createCleanCorpus has already cleaned, for --incremental
+Every input file is cleaned into its own shard in the output folder, named after the hash of its contents.
+The manifest records the size, modification time and content hash of every input file,
+the counts its cleaning gave, and a hash of the cleaning rules,
+so that a re-run only needs to clean new or changed files, or everything if the rules have changed.
+The manual lists from the annotation CSVs are applied when the shards are joined into manCleanTIW.txt,
+so changing them doesn't need any file to be cleaned again
+"""
+
+# ----- LIBRARIES ----- #
+import hashlib
+import json
+import locale
+import os
+
+from conversionManifest import sourceRecord
+# ---------------------------------------------------------------------- #
+
+# ----- PRE-DEFINED CONSTANTS ----- #
+
+SHARD_FOLDER_NAME = '.createCleanCorpus-shards'
+MANIFEST_NAME = 'manifest.json'
+# bump this if the manifest layout or the shard format changes, older manifests are then ignored
+MANIFEST_VERSION = 1
+
+# the module the cleaning rules are compiled from, any change to it cleans everything again
+RULES_MODULE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tokenCleaner.py')
+
+# ---------------------------------------------------------------------- #
+
+# ----- HELPER FUNCTIONS ----- #
+
+
+def cleaningRulesHash():
+    """
+    sha256 of everything that changes what a file cleans to, other than the file itself:
+    the cleaning rules and the encoding the files are read with
+    """
+
+    digest = hashlib.sha256(str(MANIFEST_VERSION).encode())
+    with open(RULES_MODULE, 'rb') as rules_file:
+        digest.update(rules_file.read())
+    digest.update(locale.getpreferredencoding(False).encode())
+    return digest.hexdigest()
+
+# ---------------------------------------------------------------------- #
+
+
+def shardPath(shardFolder, record):
+    """
+    Where the cleaned tokens of the file described by record are kept
+    """
+
+    return os.path.join(shardFolder, record['sha256'] + '.txt')
+
+# ---------------------------------------------------------------------- #
+
+
+def loadCleaningManifest(shardFolder):
+    """
+    Reads the manifest from the shard folder
+    Returns an empty manifest if there isn't one yet or it can't be read
+    """
+
+    manifest = {'version': MANIFEST_VERSION, 'rules': None, 'files': {}}
+    manifestPath = os.path.join(shardFolder, MANIFEST_NAME)
+    if not os.path.exists(manifestPath):
+        return manifest
+
+    try:
+        with open(manifestPath, 'r') as manifest_file:
+            saved = json.load(manifest_file)
+    except (OSError, ValueError):
+        print('Manifest {} is unreadable, cleaning everything'.format(manifestPath))
+        return manifest
+
+    if saved.get('version') != MANIFEST_VERSION:
+        return manifest
+    return saved
+
+# ---------------------------------------------------------------------- #
+
+
+def saveCleaningManifest(shardFolder, manifest):
+    """
+    Writes the manifest to the shard folder
+    Writes to a temporary file first so an interrupted run can't leave half a manifest behind
+    """
+
+    manifestPath = os.path.join(shardFolder, MANIFEST_NAME)
+    tempPath = manifestPath + '.tmp'
+    with open(tempPath, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+    os.replace(tempPath, manifestPath)
+
+# ---------------------------------------------------------------------- #
+
+
+def planCleaning(files, inputFolder, manifest, rules, shardFolder):
+    """
+    Returns [(inputFile, key, record, changed), ...] for every file, in corpus order
+        key     - the file's path relative to inputFolder, its key in manifest['files']
+        record  - its sourceRecord, or its manifest entry if it is unchanged
+        changed - True if the file has to be cleaned (again)
+    If the rules have changed since the last run, every file is cleaned again
+    """
+
+    previous = manifest['files'] if manifest['rules'] == rules else {}
+
+    plan = []
+    for inputFile in files:
+        key = os.path.relpath(inputFile, inputFolder)
+        entry = previous.get(key)
+        stat = os.stat(inputFile)
+
+        # the shard has been deleted by hand, so the file has to be cleaned again
+        if entry and not os.path.exists(shardPath(shardFolder, entry)):
+            entry = None
+
+        # size and modification time are cheap to check, so only hash when they differ
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            plan.append((inputFile, key, entry, False))
+            continue
+
+        record = sourceRecord(inputFile, stat)
+        if entry and entry['sha256'] == record['sha256']:
+            # touched but not changed, just remember the new modification time
+            entry['mtime'] = record['mtime']
+            plan.append((inputFile, key, entry, False))
+            continue
+
+        plan.append((inputFile, key, record, True))
+    return plan
+
+# ---------------------------------------------------------------------- #
+
+
+def removeUnusedShards(shardFolder, manifest):
+    """
+    Deletes the shards of files that have been changed or deleted since they were cleaned
+    """
+
+    used = set(shardPath(shardFolder, entry) for entry in manifest['files'].values())
+    for name in os.listdir(shardFolder):
+        path = os.path.join(shardFolder, name)
+        if name.endswith('.txt') and path not in used:
+            os.remove(path)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+
+"""
+Keeps track of which files convertToText has already converted
+The manifest lives in the output folder and records the size, modification time
+and content hash of every source file, plus the options used to convert them,
+so that a re-run only needs to convert new or changed files
+Sources are keyed by their path relative to the input folder, and outputs are stored relative to the output folder,
+so the manifest still holds when the script is run from another directory or the folders are given another way
+"""
+
+# ----- LIBRARIES ----- #
+import hashlib
+import json
+import os
+# ---------------------------------------------------------------------- #
+
+# ----- PRE-DEFINED CONSTANTS ----- #
+
+MANIFEST_NAME = '.convertToText-manifest.json'
+# bump this if the manifest layout changes, older manifests are then ignored
+# (version 1 stored outputs relative to the working directory)
+MANIFEST_VERSION = 2
+
+# ---------------------------------------------------------------------- #
+
+# ----- HELPER FUNCTIONS ----- #
+
+
+def hashFile(inputFile, blockSize=1 << 20):
+    """
+    Returns the sha256 of a file's contents
+    Reads the file in blocks so big scans don't have to fit in memory
+    """
+
+    digest = hashlib.sha256()
+    with open(inputFile, 'rb') as source_file:
+        for block in iter(lambda: source_file.read(blockSize), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# ---------------------------------------------------------------------- #
+
+
+def sourceRecord(inputFile, stat=None):
+    """
+    Describes a source file as it is now: size, modification time and content hash
+    """
+
+    if stat is None:
+        stat = os.stat(inputFile)
+    return {'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'sha256': hashFile(inputFile)}
+
+# ---------------------------------------------------------------------- #
+
+
+def loadManifest(outputFolderName):
+    """
+    Reads the manifest from the output folder
+    Returns an empty manifest if there isn't one yet or it can't be read
+    """
+
+    manifest = {'version': MANIFEST_VERSION, 'options': None, 'files': {}}
+    manifestPath = os.path.join(outputFolderName, MANIFEST_NAME)
+    if not os.path.exists(manifestPath):
+        return manifest
+
+    try:
+        with open(manifestPath, 'r') as manifest_file:
+            saved = json.load(manifest_file)
+    except (OSError, ValueError):
+        print('Manifest {} is unreadable, converting everything'.format(manifestPath))
+        return manifest
+
+    if saved.get('version') != MANIFEST_VERSION:
+        return manifest
+    return saved
+
+# ---------------------------------------------------------------------- #
+
+
+def saveManifest(outputFolderName, manifest):
+    """
+    Writes the manifest to the output folder
+    Writes to a temporary file first so an interrupted run can't leave half a manifest behind
+    """
+
+    manifestPath = os.path.join(outputFolderName, MANIFEST_NAME)
+    tempPath = manifestPath + '.tmp'
+    with open(tempPath, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+    os.replace(tempPath, manifestPath)
+
+# ---------------------------------------------------------------------- #
+
+
+def outputPath(entry, outputFolderName):
+    """
+    Path of the output recorded in a manifest entry, or None if the source gave no output
+    """
+
+    if not entry['output']:
+        return None
+    return os.path.join(outputFolderName, entry['output'])
+
+# ---------------------------------------------------------------------- #
+
+
+def planConversion(files, inputFolderName, outputFolderName, manifest, options, records, seen, progress):
+    """
+    Yields the files a re-run needs to convert: new, changed, or whose output has gone missing
+    Works through files lazily, so conversion can start before the input folder has been walked to the end
+    As it goes, records gets the current sourceRecord of every file yielded,
+    and seen gets the manifest key of every file looked at
+    progress['walked'] is only set to True once every file has been looked at,
+    until then seen can't tell which sources have really gone
+    If the options have changed since the last run, every file is converted again
+    """
+
+    previous = manifest['files'] if manifest['options'] == options else {}
+
+    for inputFile in files:
+        key = os.path.relpath(inputFile, inputFolderName)
+        seen.add(key)
+        entry = previous.get(key)
+        stat = os.stat(inputFile)
+
+        # the output has been deleted by hand, so it has to be made again
+        if entry and entry['output'] and not os.path.exists(outputPath(entry, outputFolderName)):
+            entry = None
+
+        # size and modification time are cheap to check, so only hash when they differ
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            continue
+
+        record = sourceRecord(inputFile, stat)
+        if entry and entry['sha256'] == record['sha256']:
+            # touched but not changed, just remember the new modification time
+            entry['mtime'] = record['mtime']
+            continue
+
+        records[inputFile] = record
+        yield inputFile
+
+    progress['walked'] = True
+
+# ---------------------------------------------------------------------- #
+
+
+def removedSources(manifest, seen):
+    """
+    Manifest entries whose source file wasn't seen, i.e. has been deleted since the last run
+    """
+
+    return {key: entry for key, entry in manifest['files'].items() if key not in seen}
+
+# ---------------------------------------------------------------------- #
+
+
+def removeStaleOutputs(manifest, removed, outputFolderName):
+    """
+    Deletes the outputs of source files that have disappeared and drops them from the manifest
+    """
+
+    for key, entry in removed.items():
+        output = outputPath(entry, outputFolderName)
+        if output and os.path.exists(output):
+            print('Removing: {}'.format(output))
+            os.remove(output)
+        del manifest['files'][key]
+
+# ---------------------------------------------------------------------- #
+
+
+def recordConversion(manifest, inputFile, inputFolderName, outputFolderName, record, newFileName):
+    """
+    Adds a converted file to the manifest
+    newFileName is None for files that were skipped, so they aren't retried every run
+    """
+
+    key = os.path.relpath(inputFile, inputFolderName)
+    output = os.path.relpath(newFileName, outputFolderName) if newFileName else None
+    # the source no longer gives any text, so its old output is out of date
+    previous = manifest['files'].get(key)
+    if previous and previous['output'] and previous['output'] != output:
+        previousOutput = outputPath(previous, outputFolderName)
+        if os.path.exists(previousOutput):
+            os.remove(previousOutput)
+    entry = dict(record)
+    entry['output'] = output
+    manifest['files'][key] = entry
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+"""
+Per-file report for convertToText
+Each converted file gets a record of which backend read it, whether it had to fall back to OCR,
+how many pages it had, its size before and after, and the time spent extracting,
+normalising and writing it. The records are written as JSON lines, so slow files
+and expensive backends can be picked out with a few lines of Python or jq
+"""
+
+# ----- LIBRARIES ----- #
+import json
+import os
+# ---------------------------------------------------------------------- #
+
+# ----- HELPER FUNCTIONS ----- #
+
+
+def newReport(inputFile):
+    """
+    An empty report for a file, filled in as the file is converted
+    backend is one of docx2python, pdftotext, tesseract, pdfplumber or textract (for other file types),
+    and stays None for files that are skipped
+    """
+
+    return {'file': inputFile,
+            'backend': None,
+            'ocr_fallback': False,
+            'ocr_pages': 0,
+            'pages': None,
+            'input_bytes': os.path.getsize(inputFile),
+            'output_bytes': 0,
+            'extract_seconds': 0.0,
+            'normalize_seconds': 0.0,
+            'write_seconds': 0.0,
+            'output': None,
+            'error': None}
+
+# ---------------------------------------------------------------------- #
+
+
+class ReportWriter:
+    """
+    Writes reports to a JSON lines file as files are done
+    It has an append method like a list, so the convert functions can be handed either
+    Every line is flushed straight away, so a run that hangs or is stopped still leaves
+    the reports of the files before it
+    """
+
+    def __init__(self, reportPath):
+        self.report_file = open(reportPath, 'w')
+
+    def append(self, report):
+        record = {key: round(value, 6) if isinstance(value, float) else value for key, value in report.items()}
+        self.report_file.write(json.dumps(record) + '\n')
+        self.report_file.flush()
+
+    def close(self):
+        self.report_file.close()
@@ -8,229 +8,754 @@ Created by Romi Hill (Appen) for Zara Maxwell-Smith (CoEDL)
 # ----- LIBRARIES ----- #
 from argparse import ArgumentParser
 import os
-import re
 import sys
-
-from docx2python import docx2python
-import unicodedata
-import subprocess
-import pdfplumber
-import textract
+import tempfile
+import time
+import io
+from collections import deque
+from itertools import islice
+
+from conversionManifest import loadManifest, planConversion, recordConversion, removedSources, removeStaleOutputs, \
+    saveManifest
+from conversionReport import ReportWriter, newReport
+from fileDiscovery import iterFiles
+from textNormalizer import LIGATURES, compileNormalizer
+
+# the extraction backends (docx2python, pdfplumber, textract), subprocess and the worker pools
+# are imported inside the functions that use them, the first time a file needs them,
+# so --help or a run that only has one kind of file doesn't pay for loading all of them
 # ---------------------------------------------------------------------- #
 
 # ----- PRE-DEFINED CONSTANTS ----- #
 
-LIGATURES = {0xFB00: u'ff',
-             0xFB03: u'ffi',
-             0xFB04: u'ffl',
-             0xFB01: u'fi',
-             0xFB02: u'fl',
-             0x000C: u'\n',
-             0x008D: u'\n',
-             0x008F: u'\n',
-             0x0090: u'\n',
-             0x0082: u'\n',
-             0x0081: u'\n',
-             0x008a: u'\n',
-             0x0089: u'\n',
-             0x0088: u'\n',
-             0x0087: u'\n',
-             0x0086: u'\n',
-             0x0085: u'\n',
-             0x0084: u'\n',
-             0xF08D: u'',
-             0xF08F: u'',
-             0xF090: u'',
-             0xF082: u'',
-             0xF081: u'',
-             0xF08a: u'',
-             0xF089: u'',
-             0xF088: u'',
-             0xF087: u'',
-             0xF086: u'',
-             0xF085: u'',
-             0xF084: u''}
+# standardise the string (e.g. convert ligatures, other encoding issues)
+normalizeFormatted = compileNormalizer(LIGATURES)
+# word documents also have repeated new lines replaced with one
+normalizeWordDocument = compileNormalizer(LIGATURES, collapseNewlines=True)
+# only keep word characters, remove multiple new lines and standardise the string
+normalizeUnformatted = compileNormalizer(LIGATURES, stripPunctuation=True, collapseNewlines=True)
+
+# resolution scanned pages are rendered at before OCR
+OCR_RESOLUTION = 300
+# how much of the pdftotext output to read at a time when streaming pages
+PAGE_READ_SIZE = 1 << 16
 
 # ---------------------------------------------------------------------- #
 
 # ----- HELPER FUNCTIONS ----- #
 
 
-def readPDFFile(inputFile):
+def ocrPDFPage(inputFile, pageNumber, language='eng'):
+    """
+    OCR a single page of a PDF
+    The page is rendered to an image with pdftoppm, then read with tesseract
+    pageNumber starts at 1, like it does for pdftoppm
+    Returns the text without the form feed tesseract ends it with, the callers put the page's own one back
+    """
+
+    import subprocess
+
+    with tempfile.TemporaryDirectory() as tempFolder:
+        imagePrefix = os.path.join(tempFolder, 'page')
+        subprocess.run(['pdftoppm', '-f', str(pageNumber), '-l', str(pageNumber), '-r', str(OCR_RESOLUTION),
+                        '-png', '-singlefile', inputFile, imagePrefix],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        result = subprocess.run(['tesseract', imagePrefix + '.png', 'stdout', '-l', language],
+                                check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    text = result.stdout.decode("utf-8")
+    return text[:-1] if text.endswith('\f') else text
+
+# ---------------------------------------------------------------------- #
+
+
+def readPDFFile(inputFile, language='eng', ocrJobs=1, report=None):
     """
     Read PDF into strings using textract
-    PDF can be encoded with text or not (i.e. an image)
+    PDF can be encoded with text or not (i.e. an image), or a mix of both
+    Pages without a text layer are OCRed one by one, ocrJobs pages at a time,
+    and put back in their place in the document
+    If report is a dict, the page count and how many pages were OCRed are recorded in it
     """
 
+    import textract
+
+    if report is None:
+        report = {}
+    report['backend'] = 'pdftotext'
+
     # extract the text from PDF
     doc = textract.process(inputFile, method='pdftotext').decode("utf-8")
 
-    # if there's no text, then doc should just consist of white spaces
-    # it might have some pesky characters like page breaks or line breaks,
-    # which is why we can't assume doc is an empty string
-    if doc.isspace():
-        # use OCR to try to convert the characters in the file into a string
-        doc = textract.process(inputFile, method='tesseract', language='eng').decode("utf-8")
+    # pdftotext ends every page with a form feed, so the last piece is whatever comes after the last page
+    pages = doc.split('\f')
+    if len(pages) == 1:
+        report['pages'] = 0
+        # no page breaks at all, so the pages can't be told apart
+        if doc.isspace():
+            report['ocr_fallback'] = True
+            doc = textract.process(inputFile, method='tesseract', language=language).decode("utf-8")
+        return doc
+    pages, tail = pages[:-1], pages[-1]
+    report['pages'] = len(pages)
+
+    # if there's no text on a page, then it should just consist of white spaces
+    # it might have some pesky characters like line breaks,
+    # which is why we can't assume the page is an empty string
+    scannedPages = [index for index, page in enumerate(pages) if not page.strip()]
+    if not scannedPages:
+        return doc
+    report['ocr_fallback'] = True
+    report['ocr_pages'] = len(scannedPages)
+
+    # use OCR to try to convert the characters on those pages into strings
+    # the work happens in the pdftoppm/tesseract processes, so threads are enough to keep them busy
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=max(1, ocrJobs)) as executor:
+        ocrPages = executor.map(lambda index: ocrPDFPage(inputFile, index + 1, language), scannedPages)
+        for index, page in zip(scannedPages, ocrPages):
+            pages[index] = page
+
+    return '\f'.join(pages) + '\f' + tail
 
-    return doc
+# ---------------------------------------------------------------------- #
+
+
+def readPDFPages(inputFile, language='eng', ocrJobs=1, report=None):
+    """
+    Read PDF one page at a time, streaming the output of pdftotext
+    Yields the text of each page, followed by its form feed, in page order
+    Pages without a text layer are OCRed, at most ocrJobs at a time,
+    so there are never more than about ocrJobs pages held in memory
+    Output with no page breaks at all and no text is OCRed whole, as in readPDFFile
+    If report is a dict, the page count and how many pages were OCRed are recorded in it
+    """
+
+    import subprocess
+    from concurrent.futures import ThreadPoolExecutor
+
+    if report is None:
+        report = {}
+    report['backend'] = 'pdftotext'
+    report['ocr_pages'] = 0
+
+    process = subprocess.Popen(['pdftotext', inputFile, '-'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    pdfText = io.TextIOWrapper(process.stdout, encoding='utf-8', newline='')
+    # pages waiting to be handed out, either text or the OCR job for a scanned page
+    pending = deque()
+    pageNumber = 0
+    pieces = []
+
+    def queuePage(page):
+        # if there's no text on the page it should just consist of white spaces, so OCR it
+        if page.strip():
+            pending.append(page + '\f')
+        else:
+            pending.append(executor.submit(ocrPDFPage, inputFile, pageNumber, language))
+            report['ocr_fallback'] = True
+            report['ocr_pages'] += 1
+
+    def readyPages():
+        # hand out pages in order, waiting for OCR only when too many pages are queued up
+        while pending and (isinstance(pending[0], str) or len(pending) > ocrJobs or pending[0].done()):
+            page = pending.popleft()
+            yield page if isinstance(page, str) else page.result() + '\f'
+
+    completed = False
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, ocrJobs)) as executor:
+            for chunk in iter(lambda: pdfText.read(PAGE_READ_SIZE), ''):
+                # pdftotext ends every page with a form feed
+                parts = chunk.split('\f')
+                pieces.append(parts[0])
+                for part in parts[1:]:
+                    pageNumber += 1
+                    queuePage(''.join(pieces))
+                    pieces = [part]
+                yield from readyPages()
+
+            # whatever comes after the last form feed isn't a page, but keep it like readPDFFile does
+            tail = ''.join(pieces)
+            report['pages'] = pageNumber
+            while pending:
+                page = pending.popleft()
+                yield page if isinstance(page, str) else page.result() + '\f'
+        completed = True
+    finally:
+        # stopped part way (an error, or the pages weren't all wanted), so don't leave pdftotext
+        # blocked on a full pipe: stop it, and wait for it either way so it doesn't linger
+        if not completed:
+            process.kill()
+        pdfText.close()
+        process.wait()
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, 'pdftotext')
+
+    # no page breaks at all, so the pages can't be told apart: OCR the whole document like readPDFFile does
+    if not pageNumber and tail.isspace():
+        import textract
+        report['ocr_fallback'] = True
+        yield textract.process(inputFile, method='tesseract', language=language).decode("utf-8")
+    elif tail:
+        yield tail
 
 # ---------------------------------------------------------------------- #
 
 
-def readPDFFile_old(inputFile):
+def readPDFPages_old(inputFile, report=None):
     """
-    Old function to read PDF into strings.
-    This function uses pdfplumber which is easier to install than textract.
-    If textract cannot be install, use this instead
+    Read PDF one page at a time using pdfplumber
+    Yields the text of each page until a page can't be read
+    If report is a dict, the page count is recorded in it
     """
 
-    # create an empty string which will store the text in the pdf 
-    doc = ''
+    import pdfplumber
+
+    if report is None:
+        report = {}
+    report['backend'] = 'pdfplumber'
+
     with pdfplumber.open(inputFile) as source_file:
+        report['pages'] = len(source_file.pages)
         # read in the string by page
         for page in source_file.pages:
             # try to extract text from the pdf
             try:
-                doc = doc + page.extract_text()
+                # pages without any text give None
+                text = page.extract_text() or ''
             # if that doesn't work, end the function. The script can't handle these kinds of files
-            except:
+            except Exception:
                 print('\tPDF is unreadable')
-                return doc
+                return
+            yield text
+
+# ---------------------------------------------------------------------- #
+
+
+def readPDFFile_old(inputFile, report=None):
+    """
+    Old function to read PDF into strings.
+    This function uses pdfplumber which is easier to install than textract.
+    If textract cannot be install, use this instead
+    """
+
+    # join the pages once at the end, rather than copying the document for every page
+    return ''.join(readPDFPages_old(inputFile, report))
+
+# ---------------------------------------------------------------------- #
+
+
+def writePages(pages, newFileName, normalize, report=None):
+    """
+    Normalises pages one at a time and appends them to newFileName,
+    so only one page is ever held in memory
+    If report is a dict, the time spent reading, normalising and writing pages is recorded in it
+    Returns the number of characters written
+    """
+
+    written = 0
+    extractSeconds = normalizeSeconds = writeSeconds = 0
+    with open(newFileName, 'w') as text_file:
+        clock = time.perf_counter()
+        for page in pages:
+            # reading and writing are interleaved, so time each step of every page
+            started = time.perf_counter()
+            extractSeconds += started - clock
+            # a page ends with its form feed, so newlines can't run across pages
+            # and normalising page by page gives the same text as normalising the whole document
+            page = normalize(page)
+            normalized = time.perf_counter()
+            normalizeSeconds += normalized - started
+            text_file.write(page)
+            written += len(page)
+            clock = time.perf_counter()
+            writeSeconds += clock - normalized
+
+    if report is not None:
+        report['extract_seconds'] = extractSeconds
+        report['normalize_seconds'] = normalizeSeconds
+        report['write_seconds'] = writeSeconds
+        report['output_bytes'] = os.path.getsize(newFileName)
+    return written
+
+# ---------------------------------------------------------------------- #
+
+
+def extractWithFormatting(inputFile, ocrJobs=1, report=None):
+    """
+    Extracts the text of a single file, maintaining formatting as much as possible
+    Uses different libraries depending on file types
+    ocrJobs is the number of scanned PDF pages to OCR at the same time
+    If report is a dict, the backend used is recorded in it
+    Returns an empty string for file types that aren't converted
+    """
+
+    if report is None:
+        report = {}
+    doc = ''
+    # get the extension of the file
+    fileExtension = os.path.splitext(inputFile)[1]
+
+    if fileExtension == '.docx':
+        print('Processing: {}'.format(inputFile))
+        # uses docx2python for now, since it's probably easier to keep the formatting consistent later on
+        from docx2python import docx2python
+        report['backend'] = 'docx2python'
+        doc = docx2python(inputFile)
+        doc = doc.text
+
+    elif fileExtension == '.doc':
+        print('Processing: {}'.format(inputFile))
+        import textract
+        report['backend'] = 'textract'
+        doc = textract.process(inputFile).decode("utf-8")
+
+    elif fileExtension == '.pdf':
+        print('Processing: {}'.format(inputFile))
+        # read in the pdf file as a string
+        # this is a bit more complicated so it has its own function
+        doc = readPDFFile(inputFile, ocrJobs=ocrJobs, report=report)
+
+    elif fileExtension == '.png' or fileExtension == '.jpeg' or fileExtension == '.jpg':
+        print('Processing: {}'.format(inputFile))
+        # uses OCR to extract the text
+        import textract
+        report['backend'] = 'tesseract'
+        report['pages'] = 1
+        report['ocr_pages'] = 1
+        doc = textract.process(inputFile, method='tesseract', language='eng+ind').decode("utf-8")
+
     return doc
 
 # ---------------------------------------------------------------------- #
 
 
-def listOfFiles(inputFolder):
+def saveText(doc, outputPathFileName, normalize, report=None):
     """
-    Amended from https://thispointer.com/python-how-to-get-list-of-files-in-directory-and-sub-directories/
-    Gets a list of files from inputFolder, including files in subfolders
+    Normalises the text and saves it as the file name + .txt
+    If report is a dict, the time spent normalising and writing is recorded in it
+    Returns the name of the file written
     """
 
-    # get all files/folders in current folder
-    filesInDir = os.listdir(inputFolder)
-    # create empty list which will contain all files
-    allFiles = []
-    # iterate over every file/folder in the directory
-    for entry in filesInDir:
-        # get the full path name of the file/folder we're at
-        fullPath = os.path.join(inputFolder, entry)
-        # Test whether the current entry is a directory
-        if os.path.isdir(fullPath):
-            # it is a directory, so get the all the files within this directory and add it to the list of files
-            allFiles = allFiles + listOfFiles(fullPath)
-        else:
-            # it is not a directory, so it must be a file. Add it to the list
-            allFiles.append(fullPath)
+    start = time.perf_counter()
+    doc = normalize(doc)
+    normalized = time.perf_counter()
+    # keep the folder structure of the input folder
+    os.makedirs(os.path.dirname(outputPathFileName), exist_ok=True)
+    newFileName = outputPathFileName + '.txt'
+    with open(newFileName, 'w') as text_file:
+        text_file.write(doc)
+
+    if report is not None:
+        report['normalize_seconds'] = normalized - start
+        report['write_seconds'] = time.perf_counter() - normalized
+        report['output_bytes'] = os.path.getsize(newFileName)
+    return newFileName
 
-    # returns a list of all files with the inputFolder and subfolders within that          
-    return allFiles
+# ---------------------------------------------------------------------- #
+
+
+def convertWithFormatting(inputFile, inputFolderName, outputFolderName, ocrJobs=1, stream=False, report=None):
+    """
+    Converts a single file into .txt
+    Maintains formatting as much as possible
+    ocrJobs is the number of scanned PDF pages to OCR at the same time
+    If stream is set, PDFs are written out page by page instead of being read whole
+    If report is a dict (see conversionReport.newReport), it is filled in as the file is converted
+    Returns the name of the file written, or None if the file type was skipped
+    """
+
+    # get the full name and the extension of the files
+    fileName, fileExtension = os.path.splitext(inputFile)
+    # direct the new file name to the output folder by replacing the input folder name to the output folder name
+    outputPathFileName = fileName.replace(inputFolderName, outputFolderName)
+
+    if fileExtension == '.pdf' and stream:
+        print('Processing: {}'.format(inputFile))
+        os.makedirs(os.path.dirname(outputPathFileName), exist_ok=True)
+        newFileName = outputPathFileName + '.txt'
+        # standardise and save each page as it is read, so big PDFs never sit in memory whole
+        if writePages(readPDFPages(inputFile, ocrJobs=ocrJobs, report=report), newFileName, normalizeFormatted,
+                      report):
+            return newFileName
+        # no text at all, so don't leave an empty file behind
+        os.remove(newFileName)
+        return None
+
+    start = time.perf_counter()
+    doc = extractWithFormatting(inputFile, ocrJobs, report)
+    if report is not None:
+        report['extract_seconds'] = time.perf_counter() - start
+    if not doc:
+        return None
+
+    # standardise the string (e.g. convert ligatures, other encoding issues) and save it
+    # repeated new lines in word documents are replaced with one
+    if fileExtension == '.docx' or fileExtension == '.doc':
+        return saveText(doc, outputPathFileName, normalizeWordDocument, report)
+    return saveText(doc, outputPathFileName, normalizeFormatted, report)
 
 # ---------------------------------------------------------------------- #
 
 
-def readWithFormatting(files, inputFolderName, outputFolderName):
+def readWithFormatting(files, inputFolderName, outputFolderName, converted=None, ocrJobs=1, stream=False,
+                       reports=None):
     """
     Converts files into .txt
     Maintains formatting as much as possible
-    Uses different libraries depending on file types
+    If converted is a list, (inputFile, newFileName) is appended to it as each file is done
+    If reports is a list (or a ReportWriter), the report of each file is appended to it
     """
-    
+
     # go over every file in list containing all files
     for inputFile in files:
-        doc = ''
-        # get the full name and the extension of the files
-        fileName, fileExtension = os.path.splitext(inputFile)
-        # direct the new file name to the output folder by replacing the input folder name to the output folder name
-        outputPathFileName = fileName.replace(inputFolderName, outputFolderName)
-        # get the output file path (not including the filename)
-        outputPath = os.path.dirname(outputPathFileName)
-
-        if fileExtension == '.docx':
-            print('Processing: {}'.format(inputFile))
-            # uses docx2python for now, since it's probably easier to keep the formatting consistent later on
-            doc = docx2python(inputFile)
-            doc = doc.text
-            # uses regex to replace repeated new lines into one
-            doc = re.sub(r'\n\n*', '\n', doc)
-            
-        elif fileExtension == '.doc':
-            print('Processing: {}'.format(inputFile))
-            doc = textract.process(inputFile).decode("utf-8")
-            # uses regex to replace repeated new lines into one newline
-            doc = re.sub(r'\n\n*', '\n', doc)
-
-        elif fileExtension == '.pdf':
-            print('Processing: {}'.format(inputFile))
-            # read in the pdf file as a string
-            # this is a bit more complicated so it has its own function
-            doc = readPDFFile(inputFile)   
-
-        elif fileExtension == '.png' or fileExtension == '.jpeg' or fileExtension == '.jpg':
-            print('Processing: {}'.format(inputFile))
-            # uses OCR to extract the text
-            doc = textract.process(inputFile, method='tesseract', language='eng+ind').decode("utf-8")
-
-        if doc:
-            # standardise the string (e.g. convert ligatures, other encoding issues)
-            doc = doc.translate(LIGATURES)
-            # save the string as the file name + .txt
-            newFileName = outputPathFileName + '.txt'
-            with open(newFileName, 'w') as text_file:
-                text_file.write(doc)
+        report = newReport(inputFile) if reports is not None else None
+        newFileName = convertWithFormatting(inputFile, inputFolderName, outputFolderName, ocrJobs, stream, report)
+        if converted is not None:
+            converted.append((inputFile, newFileName))
+        if reports is not None:
+            report['output'] = newFileName
+            reports.append(report)
 
 # ---------------------------------------------------------------------- #
 
 
-def readWithNoFormatting(files, inputFolderName, outputFolderName):
+def extractWithNoFormatting(inputFile, ocrJobs=1, report=None):
     """
-    Converts files into .txt
-    Strips punctuations and multiple new lines
+    Extracts the text of a single file
     Brute-force approach uses textract for all file types
+    PDFs go through readPDFFile so scanned pages are OCRed ocrJobs at a time
+    If report is a dict, the backend used and whether OCR was needed are recorded in it
     """
 
-    # go over every file in list containing all files
-    for inputFile in files:
-        doc = ''
-        # get the full name and the extension of the files
-        fileName, fileExtension = os.path.splitext(inputFile)
-        # skip hidden files
-        if not fileExtension:
-            continue
-        # store the output path with filename
-        outputPathFileName = fileName.replace(inputFolderName, outputFolderName)
-        # store the output path without filename
-        outputPath = os.path.dirname(outputPathFileName)
+    if report is None:
+        report = {}
 
-        # prints to terminal which file is being processed
-        # will be useful for debugging if there's an error on one of the files
-        print('Processing: {}'.format(inputFile))
+    # get the extension of the file
+    fileExtension = os.path.splitext(inputFile)[1]
 
-        # use textract to extract text
-        # process() returns a byte object, so we need to decode it into a string using .decode("utf-8")
-        # if you're getting funny symbols, we might need to change the decoder
+    # use textract to extract text
+    # process() returns a byte object, so we need to decode it into a string using .decode("utf-8")
+    # if you're getting funny symbols, we might need to change the decoder
+    if fileExtension == '.pdf':
+        # PDFs can have scanned pages mixed in with text, so they are OCRed page by page
+        doc = readPDFFile(inputFile, language='eng+ind', ocrJobs=ocrJobs, report=report)
+    else:
+        import textract
+        report['backend'] = 'textract'
         doc = textract.process(inputFile).decode("utf-8")
         # if there's no text, then doc should just consist of white spaces.
         # it might have some pesky characters like page breaks or line breaks,
         # which is why we can't assume doc is an empty string
         if doc.isspace():
             # use OCR to try to convert the characters in the file into a string
+            report['ocr_fallback'] = True
             doc = textract.process(inputFile, method='tesseract', language='eng+ind').decode("utf-8")
 
-        # only keep word characters
-        doc = re.sub(r'[^\w\s]','',doc)
+    return doc
+
+# ---------------------------------------------------------------------- #
+
+
+def convertWithNoFormatting(inputFile, inputFolderName, outputFolderName, ocrJobs=1, stream=False, report=None):
+    """
+    Converts a single file into .txt
+    Strips punctuations and multiple new lines
+    If stream is set, PDFs are written out page by page instead of being read whole
+    If report is a dict (see conversionReport.newReport), it is filled in as the file is converted
+    Returns the name of the file written, or None if the file was skipped
+    """
 
-        # remove multiple new lines
-        doc = re.sub(r'\n\n*', '\n', doc)
+    # get the full name and the extension of the files
+    fileName, fileExtension = os.path.splitext(inputFile)
+    # skip hidden files
+    if not fileExtension:
+        return None
+    # store the output path with filename
+    outputPathFileName = fileName.replace(inputFolderName, outputFolderName)
 
-        doc = doc.translate(LIGATURES)
+    # prints to terminal which file is being processed
+    # will be useful for debugging if there's an error on one of the files
+    print('Processing: {}'.format(inputFile))
 
-        # store the new file name with .txt
+    if fileExtension == '.pdf' and stream:
+        os.makedirs(os.path.dirname(outputPathFileName), exist_ok=True)
         newFileName = outputPathFileName + '.txt'
+        # strip and save each page as it is read, so big PDFs never sit in memory whole
+        writePages(readPDFPages(inputFile, language='eng+ind', ocrJobs=ocrJobs, report=report), newFileName,
+                   normalizeUnformatted, report)
+        return newFileName
+
+    start = time.perf_counter()
+    doc = extractWithNoFormatting(inputFile, ocrJobs, report)
+    if report is not None:
+        report['extract_seconds'] = time.perf_counter() - start
+
+    # only keep word characters, remove multiple new lines and standardise the string, then save it
+    return saveText(doc, outputPathFileName, normalizeUnformatted, report)
+
+# ---------------------------------------------------------------------- #
+
+
+def readWithNoFormatting(files, inputFolderName, outputFolderName, converted=None, ocrJobs=1, stream=False,
+                         reports=None):
+    """
+    Converts files into .txt
+    Strips punctuations and multiple new lines
+    If converted is a list, (inputFile, newFileName) is appended to it as each file is done
+    If reports is a list (or a ReportWriter), the report of each file is appended to it
+    """
+
+    # go over every file in list containing all files
+    for inputFile in files:
+        report = newReport(inputFile) if reports is not None else None
+        newFileName = convertWithNoFormatting(inputFile, inputFolderName, outputFolderName, ocrJobs, stream, report)
+        if converted is not None:
+            converted.append((inputFile, newFileName))
+        if reports is not None:
+            report['output'] = newFileName
+            reports.append(report)
+
+# ---------------------------------------------------------------------- #
+
+
+def convertFile(inputFile, inputFolderName, outputFolderName, keepFormatting, ocrJobs=1, stream=False):
+    """
+    Converts a single file, on its own or inside a worker process
+    Returns (inputFile, newFileName, error, report) so that a broken file is reported
+    instead of stopping the rest of the batch
+    """
+
+    report = newReport(inputFile)
+    try:
+        if keepFormatting:
+            newFileName = convertWithFormatting(inputFile, inputFolderName, outputFolderName, ocrJobs, stream, report)
+        else:
+            newFileName = convertWithNoFormatting(inputFile, inputFolderName, outputFolderName, ocrJobs, stream,
+                                                  report)
+    except Exception as error:
+        report['error'] = '{}: {}'.format(type(error).__name__, error)
+        return inputFile, None, report['error'], report
+    report['output'] = newFileName
+    return inputFile, newFileName, None, report
+
+# ---------------------------------------------------------------------- #
+
+
+def readInSeries(files, inputFolderName, outputFolderName, keepFormatting, converted=None, ocrJobs=1, stream=False,
+                 reports=None):
+    """
+    Converts files into .txt one after the other
+    Each file goes through convertFile, like in readInParallel, so a broken file is reported
+    and the rest are still converted, whatever the number of jobs
+    If converted is a list, (inputFile, newFileName) is appended to it as each file is done
+    If reports is a list (or a ReportWriter), the report of each file is appended to it
+    Returns a list of (inputFile, error) for the files which could not be converted
+    """
+
+    failed = []
+    for inputFile in files:
+        inputFile, newFileName, error, report = convertFile(inputFile, inputFolderName, outputFolderName,
+                                                            keepFormatting, ocrJobs, stream)
+        if reports is not None:
+            reports.append(report)
+        if error:
+            print('Failed: {} ({})'.format(inputFile, error))
+            failed.append((inputFile, error))
+        elif converted is not None:
+            converted.append((inputFile, newFileName))
+
+    return failed
+
+# ---------------------------------------------------------------------- #
+
+
+def readInParallel(files, inputFolderName, outputFolderName, keepFormatting, jobs, converted=None, ocrJobs=1,
+                   stream=False, reports=None):
+    """
+    Converts files into .txt using a pool of jobs worker processes
+    Each file is converted exactly as readWithFormatting/readWithNoFormatting would,
+    so the output folder ends up the same, just sooner
+    If converted is a list, (inputFile, newFileName) is appended to it as each file is done
+    If reports is a list (or a ReportWriter), the report of each file is appended to it
+    Returns a list of (inputFile, error) for the files which could not be converted
+    """
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    failed = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(convertFile, inputFile, inputFolderName, outputFolderName, keepFormatting, ocrJobs,
+                                   stream)
+                   for inputFile in files]
+        # report files as they finish, the order they finish in doesn't matter for the output
+        for future in as_completed(futures):
+            inputFile, newFileName, error, report = future.result()
+            if reports is not None:
+                reports.append(report)
+            if error:
+                print('Failed: {} ({})'.format(inputFile, error))
+                failed.append((inputFile, error))
+            elif converted is not None:
+                converted.append((inputFile, newFileName))
+
+    return failed
 
-        # write and save the file
-        with open(newFileName, 'w') as text_file:
-            text_file.write(doc)
+# ---------------------------------------------------------------------- #
+
+
+def convertBatch(batch, inputFolderName, outputFolderName, keepFormatting, ocrJobs=1, stream=False):
+    """
+    Converts a batch of files inside a long-lived worker process
+    PDFs and images are extracted with extractBatch, which skips textract and
+    OCRs every image and scanned page in the batch with one tesseract process
+    Everything else is converted the usual way
+    Returns a list of (inputFile, newFileName, error, seconds spent extracting, report),
+    seconds is None for files that didn't go through extractBatch
+    """
+
+    from extractionWorkers import DIRECT_TYPES, extractBatch
+
+    # streamed PDFs are written page by page, so they can't be extracted whole
+    direct = [inputFile for inputFile in batch if os.path.splitext(inputFile)[1] in DIRECT_TYPES
+              and not (stream and inputFile.endswith('.pdf'))]
+    for inputFile in direct:
+        print('Processing: {}'.format(inputFile))
+    details = {}
+    try:
+        docs, errors, timings = extractBatch(direct, pdfLanguage='eng' if keepFormatting else 'eng+ind',
+                                             reports=details)
+    except Exception as error:
+        # extractBatch reports broken files itself, this is for the batch as a whole (e.g. no temporary folder)
+        message = '{}: {}'.format(type(error).__name__, error)
+        docs, errors, timings = {}, {inputFile: message for inputFile in direct}, {inputFile: 0 for inputFile in direct}
+
+    results = []
+    for inputFile in batch:
+        if inputFile not in timings:
+            inputFile, newFileName, error, report = convertFile(inputFile, inputFolderName, outputFolderName,
+                                                                keepFormatting, ocrJobs, stream)
+            results.append((inputFile, newFileName, error, None, report))
+            continue
+
+        report = newReport(inputFile)
+        report.update(details.get(inputFile, {}))
+        report['extract_seconds'] = timings[inputFile]
+        if inputFile in errors:
+            report['error'] = errors[inputFile]
+            results.append((inputFile, None, errors[inputFile], None, report))
+            continue
+
+        fileName = os.path.splitext(inputFile)[0]
+        outputPathFileName = fileName.replace(inputFolderName, outputFolderName)
+        doc = docs[inputFile]
+        try:
+            if keepFormatting:
+                newFileName = saveText(doc, outputPathFileName, normalizeFormatted, report) if doc else None
+            else:
+                newFileName = saveText(doc, outputPathFileName, normalizeUnformatted, report)
+        except Exception as error:
+            report['error'] = '{}: {}'.format(type(error).__name__, error)
+            results.append((inputFile, None, report['error'], None, report))
+            continue
+        report['output'] = newFileName
+        results.append((inputFile, newFileName, None, timings[inputFile], report))
+
+    return results
+
+# ---------------------------------------------------------------------- #
+
+
+def readInBatches(files, inputFolderName, outputFolderName, keepFormatting, jobs, batchSize, converted=None,
+                  ocrJobs=1, stream=False, reports=None):
+    """
+    Converts files into .txt by handing batches of batchSize files to jobs long-lived worker processes
+    The workers load their extraction backends once when they start, instead of once per file
+    If converted is a list, (inputFile, newFileName) is appended to it as each file is done
+    If reports is a list (or a ReportWriter), the report of each file is appended to it
+    Returns (failed, timings): the (inputFile, error) of files which could not be converted,
+    and {inputFile: seconds} spent extracting each PDF and image
+    """
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from extractionWorkers import warmUpWorker
+
+    failed = []
+    timings = {}
+    # batches are cut as files are found, so the workers can start before the folder has been walked
+    files = iter(files)
+    batches = iter(lambda: list(islice(files, batchSize)), [])
+    with ProcessPoolExecutor(max_workers=jobs, initializer=warmUpWorker) as executor:
+        futures = {executor.submit(convertBatch, batch, inputFolderName, outputFolderName, keepFormatting, ocrJobs,
+                                   stream): batch
+                   for batch in batches}
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception as error:
+                # the worker itself died (e.g. killed for running out of memory), so the whole batch is lost
+                message = '{}: {}'.format(type(error).__name__, error)
+                results = []
+                for inputFile in futures[future]:
+                    report = newReport(inputFile)
+                    report['error'] = message
+                    results.append((inputFile, None, message, None, report))
+            for inputFile, newFileName, error, seconds, report in results:
+                if reports is not None:
+                    reports.append(report)
+                if error:
+                    print('Failed: {} ({})'.format(inputFile, error))
+                    failed.append((inputFile, error))
+                    continue
+                if converted is not None:
+                    converted.append((inputFile, newFileName))
+                if seconds is not None:
+                    timings[inputFile] = seconds
+
+    return failed, timings
+
+# ---------------------------------------------------------------------- #
+
+
+def reportFailures(failed, total):
+    """
+    Lists the files which could not be converted at the end of a run
+    """
+
+    if failed:
+        print(f"{len(failed)} of {total} files could not be converted:")
+        for inputFile, error in failed:
+            print(f"\t{inputFile}: {error}")
+
+# ---------------------------------------------------------------------- #
+
+
+def compareWithTextract(timings, keepFormatting, sampleSize):
+    """
+    Times the textract path on a sample of the files the workers extracted,
+    and reports how much time per file the workers saved
+    """
+
+    sample = sorted(timings)[:sampleSize]
+    if not sample:
+        return
+
+    print(f"Timing textract on {len(sample)} files for comparison")
+    textractSeconds = 0
+    for inputFile in sample:
+        start = time.perf_counter()
+        if keepFormatting:
+            extractWithFormatting(inputFile)
+        else:
+            extractWithNoFormatting(inputFile)
+        textractSeconds += time.perf_counter() - start
+
+    textractPerFile = textractSeconds / len(sample)
+    workerPerFile = sum(timings[inputFile] for inputFile in sample) / len(sample)
+    savedPerFile = textractPerFile - workerPerFile
+    print(f"textract: {textractPerFile * 1000:.1f} ms per file, workers: {workerPerFile * 1000:.1f} ms per file")
+    print(f"Saved {savedPerFile * 1000:.1f} ms per file, "
+          f"about {savedPerFile * len(timings):.1f} s over the {len(timings)} files the workers extracted")
 
 # ---------------------------------------------------------------------- #
 
@@ -245,12 +770,41 @@ def main():
     # whether or not to try and keep the original formatting
     parser.add_argument('-n', '--no-formatting', help='Discard formatting', dest='formatting', action='store_false')
     parser.add_argument('-f', '--formatting', help='Maintain formatting', dest='formatting', action='store_true')
+    # how many files to convert at the same time
+    parser.add_argument('-j', '--jobs', help='Number of files to convert in parallel', type=int, default=1)
+    # how many scanned pages of one PDF to OCR at the same time, defaults to sharing the cores between the jobs
+    parser.add_argument('--ocr-jobs', help='Number of scanned PDF pages to OCR in parallel', type=int, default=None)
+    # write PDFs out a page at a time, so memory use doesn't grow with the size of the PDF
+    parser.add_argument('-s', '--stream', help='Convert PDFs page by page to save memory', action='store_true')
+    # which extraction backend to use, the workers keep the extraction engines loaded between files
+    parser.add_argument('-b', '--backend', help='Extract with textract per file, or with long-lived workers in batches',
+                        choices=['textract', 'workers'], default='textract')
+    parser.add_argument('--batch-size', help='Number of files handed to a worker at a time', type=int, default=32)
+    # off by default, as it extracts the files a second time with textract (which has to be installed)
+    parser.add_argument('--compare', help='Number of files to time with textract to compare against the workers',
+                        type=int, default=0)
+    # ignore the manifest of a previous run and convert everything again
+    parser.add_argument('-r', '--rebuild', help='Convert all files, even if they have not changed', action='store_true')
+    # one JSON line per file with its backend, page count, sizes and timings, for finding slow files
+    parser.add_argument('--report', help='Write a JSON lines report of every converted file to this path', type=str,
+                        default=None)
     args = parser.parse_args()
+    # a batch of no files would hand the workers nothing, and the run would quietly convert nothing
+    if args.batch_size < 1:
+        parser.error('--batch-size must be at least 1')
 
     try:
         inputFolderName = args.input_dir
         outputFolderName = args.output_dir
         keepFormatting = args.formatting
+        jobs = args.jobs
+        rebuild = args.rebuild
+        stream = args.stream
+        backend = args.backend
+        batchSize = args.batch_size
+        compareFiles = args.compare
+        reportPath = args.report
+        ocrJobs = args.ocr_jobs or max(1, (os.cpu_count() or 1) // max(1, jobs))
     except Exception:
         parser.print_help()
         sys.exit(0)
@@ -260,13 +814,55 @@ def main():
     if not os.path.exists(outputFolderName):
         os.makedirs(outputFolderName)
 
-    # get list of files from inputFolder
-    files = listOfFiles(inputFolderName)
-
-    if keepFormatting:
-        readWithFormatting(files, inputFolderName, outputFolderName)
-    else:
-        readWithNoFormatting(files, inputFolderName, outputFolderName)
+    # only convert the files that are new or have changed since the last run
+    manifest = loadManifest(outputFolderName)
+    if rebuild:
+        # forget the options of the last run, so every file counts as changed
+        manifest['options'] = None
+    options = {'formatting': keepFormatting}
+    records = {}
+    seen = set()
+    progress = {'walked': False}
+
+    # files are handed out as the input folder is walked, so conversion starts straight away
+    files = planConversion(iterFiles(inputFolderName), inputFolderName, outputFolderName, manifest, options, records,
+                           seen, progress)
+
+    converted = []
+    finished = False
+    reports = ReportWriter(reportPath) if reportPath else None
+    try:
+        timings = {}
+        if backend == 'workers':
+            failed, timings = readInBatches(files, inputFolderName, outputFolderName, keepFormatting, jobs, batchSize,
+                                            converted, ocrJobs, stream, reports)
+        elif jobs > 1:
+            failed = readInParallel(files, inputFolderName, outputFolderName, keepFormatting, jobs, converted, ocrJobs,
+                                    stream, reports)
+        else:
+            # one file at a time, but a broken file is still reported rather than ending the run
+            failed = readInSeries(files, inputFolderName, outputFolderName, keepFormatting, converted, ocrJobs, stream,
+                                  reports)
+        reportFailures(failed, len(records))
+        compareWithTextract(timings, keepFormatting, compareFiles)
+        finished = True
+    finally:
+        if reports is not None:
+            reports.close()
+        # save whatever was converted, even if the run was stopped part way through
+        for inputFile, newFileName in converted:
+            recordConversion(manifest, inputFile, inputFolderName, outputFolderName, records[inputFile], newFileName)
+        # only a full walk of the input folder shows which sources have really gone, and planConversion says
+        # when it has got to the end, the backend returning doesn't mean it asked for every file
+        if progress['walked']:
+            removeStaleOutputs(manifest, removedSources(manifest, seen), outputFolderName)
+        # the options are only changed after a full run: planConversion reads them lazily while the folder is walked,
+        # and after a partial run the files it didn't get to still hold output made with the old options
+        if progress['walked'] and finished:
+            manifest['options'] = options
+        saveManifest(outputFolderName, manifest)
+
+    print(f"{len(converted)} of {len(records)} new or changed files converted")
 
 # ---------------------------------------------------------------------- #
 
@@ -5,355 +5,878 @@
 Takes all .txt files in a folder (including subfolders),
 reads as a corpus and provides a few basic cleaning needs.
 Created by Romi Hill (Appen) and Zara Maxwell-Smith (CoEDL).
+
+Each cleaning step is a generator that takes tokens and yields tokens,
+so tokens flow from the input files to manCleanTIW.txt one at a time
+and the corpus is never held in memory. The steps can be imported and
+chained by hand to step through a new corpus. cleanTokens runs all of them at once
+with the cleaner compiled by tokenCleaner.py, which gives the same tokens much faster.
 """
 
-# creates and loads file path
+# ----- LIBRARIES ----- #
+from argparse import ArgumentParser
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain, groupby, islice
+import json
+import locale
+import mmap
+from operator import itemgetter
 import os
 import re
-import csv
+import shutil
+import tempfile
+import time
+
+from annotationRules import loadAnnotationRules
+from cleaningManifest import SHARD_FOLDER_NAME, cleaningRulesHash, loadCleaningManifest, planCleaning, \
+    removeUnusedShards, saveCleaningManifest, shardPath
+from fileDiscovery import iterFiles
+# the cleaning rules (characters_to_remove, removeFromBetween, ...) live with the compiled cleaner
+from tokenCleaner import CACHE_SIZE, characters_to_remove, compileCleaner, hyphenList, inValid_tokens, \
+    removeFromBetween, valid_singles
+from vocabulary import Corpus, internTokens
+# ---------------------------------------------------------------------- #
+
+# ----- PRE-DEFINED CONSTANTS ----- #
+
+# files bigger than this are cleaned in pieces of about this size when cleaning in parallel
+SHARD_SIZE = 64 << 20
+
+# bytes of input read, decoded and split at a time with --mmap
+READ_BATCH = 1 << 20
+
+# number of words each step is run over at a time with --stats
+MEASURE_BATCH = 1 << 16
+
+# number of tokens written to the output at a time
+WRITE_BATCH = 1 << 14
 
+# the cleaner each worker process uses, set up once when the worker starts
+WORKER = {}
 
-def listOfFiles(inputFolder):
+# ---------------------------------------------------------------------- #
+
+# ----- HELPER FUNCTIONS ----- #
+
+
+def newStats():
     """
-    Amended from https://thispointer.com/python-how-to-get-list-of-files-in-directory-and-sub-directories/
-    Gets a list of files from inputFolder, including files in subfolders
+    Counters filled in by the cleaning steps as tokens go through them
+        counts  - number of tokens read, written and removed by each step
+        the others - how often each type was removed (or, for hyphens, seen) by a step,
+                     so they grow with the number of types rather than the number of tokens
     """
 
-    # get all files/folders in current folder
-    filesInDir = os.listdir(inputFolder)
-    # create empty list which will contain all files
-    allFiles = []
-    # iterate over every file/folder in the directory
-    for entry in filesInDir:
-        # get the full path name of the file/folder we're at
-        fullPath = os.path.join(inputFolder, entry)
-        # Test whether the current entry is a directory
-        if os.path.isdir(fullPath):
-            # it is a directory, so get the all the files within this directory and add it to the list of files
-            allFiles = allFiles + listOfFiles(fullPath)
-        else:
-            # it is not a directory, so it must be a file. Add it to the list
-            allFiles.append(fullPath)
+    return {'counts': Counter(),
+            'hyphens': Counter(),
+            'num': Counter(),
+            'exNum': Counter(),
+            'discard': Counter(),
+            'manRemove': Counter()}
 
-    # returns a list of all files with the inputFolder and subfolders within that
-    return allFiles
+# ---------------------------------------------------------------------- #
 
 
-inputFolder = './step2/input/'
-outputFolder = './step2/output/'
+def mergeStats(stats, moreStats):
+    """
+    Adds the counts in moreStats to stats, e.g. the stats of one shard to those of the whole corpus
+    """
 
-# get list of files from inputFolder
-files = listOfFiles(inputFolder)
-allWordsList = []
+    for name, counter in moreStats.items():
+        stats[name].update(counter)
 
-# go over every file in list containing all files
-for inputFile in files:
-    # get the full name and the extension of the files
-    fileName, fileExtension = os.path.splitext(inputFile)
+# ---------------------------------------------------------------------- #
 
-    if fileExtension == '.txt':
-        # load into nltk and tokenize
-        # text = nltk.data.load(inputFile, format='text')
-        # tokens = tokens + nltk.word_tokenize(text)
-        # print('tokens thus far', len(tokens))
+
+def readWords(files, stats):
+    """
+    Yields every white space separated word of every file, in order
+    """
+
+    for inputFile in files:
         with open(inputFile, 'r') as source_file:
             print('Processing: {}'.format(inputFile))
             for line in source_file:
                 for word in line.split():
-                    allWordsList.append(word)
+                    stats['counts']['words'] += 1
+                    yield word
 
-print(f"Length of list containing all words is {len(allWordsList)}")
+# ---------------------------------------------------------------------- #
 
-# create list of types in corpus for inspection
-# typesintext = set(allWordsList)
 
-# print(allWordsList[395273:395373])
-# print(allWordsList[0:100])
+def readWordBatches(inputFile, stats, start=0, end=None, batchSize=READ_BATCH):
+    """
+    Yields the white space separated words of a file, or of the lines between the byte offsets start and end,
+    as lists of the words in about batchSize bytes at a time
+    The file is memory mapped, and each batch ends at a new line found in the bytes, so it can be decoded
+    and split in one go. A whole batch splits into the same words as its lines would one at a time
+    """
 
+    encoding = locale.getpreferredencoding(False)
+    with open(inputFile, 'rb') as source_file:
+        size = os.fstat(source_file.fileno()).st_size
+        end = size if end is None else min(end, size)
+        if start >= end:
+            # an empty file can't be mapped
+            return
+        with mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            while start < end:
+                stop = min(start + batchSize, end)
+                if stop < end:
+                    # end the batch after the last new line in it, or the first one after it for a very long line
+                    newline = mapped.rfind(b'\n', start, stop)
+                    if newline < 0:
+                        newline = mapped.find(b'\n', stop, end)
+                    stop = end if newline < 0 else newline + 1
+                words = mapped[start:stop].decode(encoding).split()
+                stats['counts']['words'] += len(words)
+                yield words
+                start = stop
+
+# ---------------------------------------------------------------------- #
+
+
+def readWordsMapped(files, stats, batchSize=READ_BATCH):
+    """
+    Yields the same words as readWords, read a batch at a time with readWordBatches
+    The batches are flattened in C, so there is nothing to do per word until the cleaner
+    """
 
-'''Clean characters from each end and within strings'''
+    for inputFile in files:
+        print('Processing: {}'.format(inputFile))
+        yield from chain.from_iterable(readWordBatches(inputFile, stats, batchSize=batchSize))
 
-# make tokens lowercase
-lowerTokens = [w.lower() for w in allWordsList]
+# ---------------------------------------------------------------------- #
 
-# strips characters from front and back of tokens
+# ----- CLEANING STEPS ----- #
 
-# test list
-# x = ['makan.', '!saya', '$loss.more!#']
+'''Clean characters from each end and within strings'''
 
-characters_to_remove = '“”"…!#$%&@()()*+,-./:;<=>➢?@[\]^_`{|}~•●•_«»✶’‘✓üûð☐'
-strippedTokensList = []
-splitTokensList = []
 
-for token in lowerTokens:
-    new_token = token.strip(characters_to_remove)
-    strippedTokensList.append(new_token)
+def lowerTokens(tokens):
+    """
+    Make tokens lowercase
+    """
 
-# splits tokens with a given character two words e.g. 'loss.more' with whitespace
+    for token in tokens:
+        yield token.lower()
 
-removeFromBetween = './—–―;:<=>➢?@[\]^_`{|}~•●•_«»“”"…!#$%&@()()*+,'
+# ---------------------------------------------------------------------- #
 
-for token in strippedTokensList:
-    pattern = "[" + removeFromBetween + "]"
-    new_token = re.sub(pattern, " ", token)
-    splitTokensList.append(new_token)
 
-# splits any tokens that contain whitespace
+def stripTokens(tokens, characters=characters_to_remove):
+    """
+    Strips characters from front and back of tokens
+    e.g. ['makan.', '!saya', '$loss.more!#'] gives 'makan', 'saya', 'loss.more'
+    """
 
-splitRetokenizeList = [word for line in splitTokensList for word in line.split()]
-types = set(splitRetokenizeList)
+    for token in tokens:
+        yield token.strip(characters)
 
+# ---------------------------------------------------------------------- #
 
-'''Hyphens!!!! checkup'''
 
-# creates listB of tokens in which there is a 'word-word' (char(45) hyphen used
-# ord 8211, 8212,8213 are all hyphens also 45 (normal use)
-# test list on next line
-# b = ['sebelum―anda―kampus―ke―bersiap-siap―berangkat―harus―dulu','antara-------------dan', '--this-is', '9makan.', '64!saya', '8-no', '', 'eat/drink',]
+def splitTokens(tokens, characters=removeFromBetween):
+    """
+    Splits tokens with a given character into two words e.g. 'loss.more'
+    Tokens left empty by stripping disappear here too
+    """
+
+    pattern = re.compile("[" + characters + "]")
+    for token in tokens:
+        # splits any tokens that contain whitespace
+        yield from pattern.sub(" ", token).split()
 
-# listB = [a for a in b if re.search('\w–\w', a)]
+# ---------------------------------------------------------------------- #
 
-# finds all tokens with a hyphen in them to check on cleaning process
 
-hyphenList = ['–', '—', '-', '―']
-hyphenTokens = []
-#hyphenLegitTokens = []
+'''Hyphens!!!! checkup'''
 
-for token in splitRetokenizeList:
-    for hyphen in hyphenList:
-        if hyphen in token:
-            hyphenTokens.append(token)
 
-# lists types in tokens for closer inspection
+def countHyphens(tokens, stats, hyphens=hyphenList):
+    """
+    Passes every token on, counting the tokens with a hyphen in them to check on cleaning process
+    Inspect them with sorted(stats['hyphens']), and the unicode number of a hyphen using ord("-")
+    """
 
-typesinhyphens = set(hyphenTokens)
-hyphensSorted = sorted(typesinhyphens)
+    for token in tokens:
+        for hyphen in hyphens:
+            if hyphen in token:
+                stats['hyphens'][token] += 1
+        yield token
 
-# inspect the unicode number using:
-# ord("-")
+# ---------------------------------------------------------------------- #
 
 
 '''Numerals'''
 
-# removes numerals from tokens
 
-noNum = []
-num = []
+def removeNumbers(tokens, stats):
+    """
+    Removes tokens that are numerals
+    """
 
-for token in splitRetokenizeList:
-    if token.isdigit():
-        num.append(token)
-    else:
-        noNum.append(token)
+    for token in tokens:
+        if token.isdigit():
+            stats['num'][token] += 1
+        else:
+            yield token
 
-# typestest = set(noNum)
+# ---------------------------------------------------------------------- #
 
-# remove exercise numbers with format digit-digit
 
-stripExNum = []
-exNum = []
+def removeExerciseNumbers(tokens, stats):
+    """
+    Remove exercise numbers with format digit-digit
+    """
 
-for token in noNum:
-    if not re.search('\d-\d', token):
-        stripExNum.append(token)
-    else:
-        exNum.append(token)
+    exerciseNumber = re.compile(r'\d-\d')
+    for token in tokens:
+        if not exerciseNumber.search(token):
+            yield token
+        else:
+            stats['exNum'][token] += 1
 
-# Another option
-# stripExNum = [x for x in splitRetokenizeList if any(re.search('\d*-\d*', x) for c in x)]
-# typestest = set(stripExNum)
+# ---------------------------------------------------------------------- #
 
-# replace numerals with whitespace and retokenise on whitespace
 
-stripNum = []
+def splitNumbers(tokens):
+    """
+    Replace numerals with whitespace and retokenise on whitespace
+    """
 
-for token in stripExNum:
-    new_token = re.sub("\d+", " ", token)
-    stripNum.append(new_token)
+    numerals = re.compile(r'\d+')
+    for token in tokens:
+        yield from numerals.sub(" ", token).split()
 
-stripNumRetok = [word for line in stripNum for word in line.split()]
+# ---------------------------------------------------------------------- #
 
 
 '''Letters'''
 
-# remove single letters except 'i' and 'a'
-valid_singles = ['i', 'a']
-stripExAlpha = []
 
-for token in stripNumRetok:
-    if token in valid_singles or len(token) >= 2:
-        stripExAlpha.append(token)
+def removeSingleLetters(tokens, validSingles=valid_singles):
+    """
+    Remove single letters except 'i' and 'a'
+    """
 
+    for token in tokens:
+        if token in validSingles or len(token) >= 2:
+            yield token
 
-'''Specific unwanted strings'''
+# ---------------------------------------------------------------------- #
 
-inValid_tokens = ['ab', 'fj', 'bcefh', 'abce', 'acd', 'bcdeh']
-final_tokens = []
-discard = []
 
-for token in stripExAlpha:
-    if token in inValid_tokens:
-        discard.append(token)
-    else:
-        final_tokens.append(token)
+'''Specific unwanted strings'''
 
-typesInFinal = set(final_tokens)
 
-print(final_tokens)
+def removeInvalidTokens(tokens, stats, invalidTokens=inValid_tokens):
+    """
+    Remove specific unwanted strings
+    """
 
-#############
+    for token in tokens:
+        if token in invalidTokens:
+            stats['discard'][token] += 1
+        else:
+            yield token
+
+# ---------------------------------------------------------------------- #
 
 """
 This section includes methods for further cleaning, using manually created lists.
+The lists are read from manRemnants.csv and remnants_ann.csv by annotationRules.py
 """
 
-'''
-Split manually marked strings that have a hyphen e.g. 'putih-white
 
-To manually split files that have a hyphen, 
-include the hyphenated word in the first column of a csv, 
-and value 1 in second column.
-'''
+def splitMarkedHyphens(tokens, splitHyphenList):
+    """
+    Splits the tokens in splitHyphenList on their hyphens
+    e.g. with ['udah-sudah', 'anak-anak'], 'anak-anak' gives 'anak', 'anak'
+    """
 
-manHyphenSplit = []
+    # a set, so each token is checked in one lookup however long the list is
+    splitHyphenList = frozenset(splitHyphenList)
+    for token in tokens:
+        if token in splitHyphenList:
+            yield from token.replace('-', ' ').split()
+        else:
+            yield token
 
-remnants_man_path = os.path.join(inputFolder,'manRemnants.csv')
-if os.path.exists(remnants_man_path):
-    splitHyphenList = []
-    with open(os.path.join(inputFolder, 'manRemnants.csv'), 'r') as csvFile:
-            csvReader = csv.reader(csvFile)
-            for row in csvReader:
-                if row[1] == '1':
-                    splitHyphenList.append(row[0])
+# ---------------------------------------------------------------------- #
 
-    # test list on next line
-    # t = ['udah-sudah', 'eat', 'anak-anak', 'ungu-purple']
 
-    for token in final_tokens:
-        if token in splitHyphenList:
-                pattern = "[" + '-' + "]"
-                new_token = re.sub(pattern, " ", token)
-                manHyphenSplit.append(new_token)
-        else:
-            manHyphenSplit.append(token)
+def countMarkedRemovals(tokens, stats, manRemove):
+    """
+    Counts the tokens marked for removal in manRemove
+    Every token is still passed on: manCleanTIW.txt has always been written from the hyphen split tokens,
+    and only the number of valid tokens reported at the end leaves the marked strings out
+    """
 
-    manHyphenSplit = [word for line in manHyphenSplit for word in line.split()]
-else:
-    print('No manRemnants file found')
-    # fall back to use the results of the previous stage
-    manHyphenSplit = final_tokens
+    manRemove = frozenset(manRemove)
+    for token in tokens:
+        if token in manRemove:
+            stats['manRemove'][token] += 1
+        yield token
 
+# ---------------------------------------------------------------------- #
 
-'''
-Remove marked up strings from a csv
 
-To explicitly remove words, 
-make a CSV with words in the first column,
-and the value 1 in the third column
-'''
-manFinal_tokens = []
+def cleaningSteps(stats, splitHyphenList=None, manRemove=None):
+    """
+    All the cleaning steps in order, as (name, step) pairs where step takes tokens and yields tokens
+    """
 
-remnants_ann_path = os.path.join(inputFolder,'remnants_ann.csv')
-if os.path.exists(remnants_ann_path):
-    manRemove = []
+    steps = [('lowerTokens', lowerTokens),
+             ('stripTokens', stripTokens),
+             ('splitTokens', splitTokens),
+             ('countHyphens', partial(countHyphens, stats=stats)),
+             ('removeNumbers', partial(removeNumbers, stats=stats)),
+             ('removeExerciseNumbers', partial(removeExerciseNumbers, stats=stats)),
+             ('splitNumbers', splitNumbers),
+             ('removeSingleLetters', removeSingleLetters),
+             ('removeInvalidTokens', partial(removeInvalidTokens, stats=stats))]
+    if splitHyphenList is not None:
+        steps.append(('splitMarkedHyphens', partial(splitMarkedHyphens, splitHyphenList=frozenset(splitHyphenList))))
+    if manRemove is not None:
+        steps.append(('countMarkedRemovals', partial(countMarkedRemovals, stats=stats, manRemove=frozenset(manRemove))))
+    return steps
+
+# ---------------------------------------------------------------------- #
+
+
+def cleanTokensInSteps(words, stats, splitHyphenList=None, manRemove=None):
+    """
+    Chains all the cleaning steps together
+    Nothing is read until the tokens are asked for, then they come out one at a time
+    This is the readable version of cleanTokens, and what the compiled cleaner is checked against
+    """
 
-    with open(os.path.join(inputFolder,'remnants_ann.csv'), 'r') as csvFile:
-            csvReader = csv.reader(csvFile)
-            for row in csvReader:
-                if row[2] == '1':
-                    manRemove.append(row[0])
+    tokens = words
+    for name, step in cleaningSteps(stats, splitHyphenList, manRemove):
+        tokens = step(tokens)
+    return tokens
 
-    discard = []
+# ---------------------------------------------------------------------- #
 
-    for token in manHyphenSplit:
-        if token in manRemove:
-            discard.append(token)
-        else:
-            manFinal_tokens.append(token)
 
-    # typesInManFinal = set(manFinal_tokens)
-else:
-    print('No remnants_ann file found')
-    # fall back to use the results of the previous stage
-    manFinal_tokens = manHyphenSplit
+def cleanTokensMeasured(words, stats, stageStats, splitHyphenList=None, manRemove=None, batchSize=MEASURE_BATCH):
+    """
+    Gives the same tokens as cleanTokensInSteps, but runs each step over batchSize words at a time,
+    so the time spent in each step can be measured on its own
+    Once all the words are cleaned, stageStats gets one dict per step (after one for reading the words) with
+        tokens_in, tokens_out - how many tokens went into and came out of the step
+        types_in, types_out   - how many distinct tokens did
+        seconds               - time spent in the step
+    """
 
+    steps = [('readWords', None)] + cleaningSteps(stats, splitHyphenList, manRemove)
+    records = [{'stage': name, 'tokens_in': 0, 'tokens_out': 0, 'seconds': 0.0} for name, step in steps]
+    # the distinct tokens coming out of each step, which are the ones going into the next
+    types = [set() for step in steps]
+
+    words = iter(words)
+    while True:
+        start = time.perf_counter()
+        tokens = list(islice(words, batchSize))
+        records[0]['seconds'] += time.perf_counter() - start
+        if not tokens:
+            break
+        records[0]['tokens_in'] += len(tokens)
+        records[0]['tokens_out'] += len(tokens)
+        types[0].update(tokens)
+
+        for (name, step), record, stepTypes in zip(steps[1:], records[1:], types[1:]):
+            start = time.perf_counter()
+            cleaned = list(step(tokens))
+            record['seconds'] += time.perf_counter() - start
+            record['tokens_in'] += len(tokens)
+            record['tokens_out'] += len(cleaned)
+            stepTypes.update(cleaned)
+            tokens = cleaned
+        yield from tokens
+
+    for index, record in enumerate(records):
+        record['types_in'] = len(types[index - 1]) if index else len(types[0])
+        record['types_out'] = len(types[index])
+    stageStats.extend(records)
+
+# ---------------------------------------------------------------------- #
+
+
+def cleanTokens(words, stats, splitHyphenList=None, manRemove=None, cacheSize=CACHE_SIZE):
+    """
+    Runs every cleaning step on each word in one go, with the cleaner compiled by tokenCleaner
+    Gives the same tokens and stats as cleanTokensInSteps
+    The results for up to cacheSize distinct words are remembered, since the same words turn up over and over,
+    and the cache hits and misses are added to stats['counts'] once all the words are cleaned
+    """
 
-#######
-###############
-#######################
+    clean = compileCleaner(splitHyphenList=splitHyphenList, manRemove=manRemove, cacheSize=cacheSize)
+    return applyCleaner(words, stats, clean)
 
-'''Write corpus to file'''
+# ---------------------------------------------------------------------- #
 
-with open(os.path.join(outputFolder, 'manCleanTIW.txt'), 'w') as outFile:
-    outFile.write('\n'.join(manHyphenSplit))
 
-######################
-#############
-########
+def applyCleaner(words, stats, clean):
+    """
+    Cleans words with a cleaner from tokenCleaner.compileCleaner, adding what it counts to stats
+    A cleaner with a cache can be used again for more words, and keeps what it remembers;
+    only the hits and misses for these words are added
+    """
+
+    cached = hasattr(clean, 'cache_info')
+    if cached:
+        before = clean.cache_info()
+
+    for word in words:
+        tokens, events = clean(word)
+        for counter, key in events:
+            stats[counter][key] += 1
+        yield from tokens
+
+    if cached:
+        after = clean.cache_info()
+        stats['counts']['cacheHits'] += after.hits - before.hits
+        stats['counts']['cacheMisses'] += after.misses - before.misses
+
+# ---------------------------------------------------------------------- #
+
+
+def writeTokens(tokens, outputFile, stats, batchSize=WRITE_BATCH):
+    """
+    Write corpus to file, one token per line with no new line after the last one
+    Tokens are written batchSize at a time, which is much quicker than one write per token
+    """
+
+    tokens = iter(tokens)
+    with open(outputFile, 'w') as outFile:
+        separator = ''
+        for batch in iter(lambda: list(islice(tokens, batchSize)), []):
+            outFile.write(separator + '\n'.join(batch))
+            separator = '\n'
+            stats['counts']['written'] += len(batch)
+
+# ---------------------------------------------------------------------- #
+
+
+def writeStageStats(statsFile, stageStats, stats, seconds):
+    """
+    Writes the stats of every step from cleanTokensMeasured, the overall counts and the run time to a JSON file
+    Also prints a table of the steps
+    """
+
+    with open(statsFile, 'w') as outFile:
+        json.dump({'stages': stageStats, 'counts': dict(stats['counts']), 'seconds': seconds}, outFile, indent=1)
+
+    print(f"{'step':<24}{'tokens in':>12}{'tokens out':>12}{'types in':>10}{'types out':>10}{'seconds':>9}")
+    for record in stageStats:
+        print(f"{record['stage']:<24}{record['tokens_in']:>12}{record['tokens_out']:>12}"
+              f"{record['types_in']:>10}{record['types_out']:>10}{record['seconds']:>9.3f}")
+
+# ---------------------------------------------------------------------- #
 
-print(f"we have {len(manFinal_tokens)} valid tokens")
-print('done')
+# ----- CLEANING IN PARALLEL ----- #
 
 
+def shardRanges(inputFile, shardSize=SHARD_SIZE):
+    """
+    Splits a file into (start, end) byte ranges of about shardSize bytes
+    Every range ends just after a new line (or at the end of the file), so no line is cut in two
+    """
+
+    fileSize = os.path.getsize(inputFile)
+    starts = [0]
+    with open(inputFile, 'rb') as source_file:
+        for offset in range(shardSize, fileSize, shardSize):
+            if offset <= starts[-1]:
+                # the last line was longer than a whole shard
+                continue
+            # move forward to the start of the next line
+            source_file.seek(offset - 1)
+            source_file.readline()
+            if source_file.tell() < fileSize:
+                starts.append(source_file.tell())
+    return list(zip(starts, starts[1:] + [fileSize]))
+
+# ---------------------------------------------------------------------- #
+
+
+def planShards(files, shardSize=SHARD_SIZE):
+    """
+    Yields (inputFile, start, end) for every piece of every file, in corpus order
+    """
+
+    for inputFile in files:
+        for start, end in shardRanges(inputFile, shardSize):
+            yield inputFile, start, end
+
+# ---------------------------------------------------------------------- #
+
+
+def readWordsInRange(inputFile, start, end, stats):
+    """
+    Yields every white space separated word in the lines between the byte offsets start and end
+    Lines are decoded the same way open() in text mode would decode them
+    """
+
+    encoding = locale.getpreferredencoding(False)
+    with open(inputFile, 'rb') as source_file:
+        source_file.seek(start)
+        position = start
+        while position < end:
+            line = source_file.readline()
+            if not line:
+                break
+            position += len(line)
+            for word in line.decode(encoding).split():
+                stats['counts']['words'] += 1
+                yield word
+
+# ---------------------------------------------------------------------- #
+
+
+def setUpWorker(splitHyphenList, manRemove, cacheSize, mapped=False):
+    """
+    Runs once in each worker process when the pool starts, so the manual lists are only sent over once
+    and the cleaner, with its cache, is kept from one piece to the next
+    """
+
+    WORKER['clean'] = compileCleaner(splitHyphenList=splitHyphenList, manRemove=manRemove, cacheSize=cacheSize)
+    WORKER['mapped'] = mapped
+
+# ---------------------------------------------------------------------- #
+
+
+def cleanShard(shard):
+    """
+    Cleans one piece of one file inside a worker process
+    shard is (inputFile, start, end, shardFile): the tokens are written to shardFile
+    Returns the stats of the piece
+    """
+
+    inputFile, start, end, shardFile = shard
+    if start == 0:
+        print('Processing: {}'.format(inputFile))
+    stats = newStats()
+    if WORKER['mapped']:
+        words = chain.from_iterable(readWordBatches(inputFile, stats, start, end))
+    else:
+        words = readWordsInRange(inputFile, start, end, stats)
+    tokens = applyCleaner(words, stats, WORKER['clean'])
+    writeTokens(tokens, shardFile, stats)
+    return stats
+
+# ---------------------------------------------------------------------- #
+
+
+def cleanPieces(files, pieceFolder, splitHyphenList, manRemove, jobs, shardSize=SHARD_SIZE, cacheSize=CACHE_SIZE,
+                mapped=False):
+    """
+    Cleans files with jobs worker processes, splitting big files into pieces of about shardSize bytes
+    Each piece is cleaned into its own file in pieceFolder, read with readWordBatches if mapped is set
+    Yields (inputFile, pieceFile, stats) for every piece in corpus order, as soon as it and the ones before are done
+    """
+
+    pieces = [(inputFile, start, end, os.path.join(pieceFolder, '{:08d}.txt'.format(number)))
+              for number, (inputFile, start, end) in enumerate(planShards(files, shardSize))]
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=setUpWorker,
+                             initargs=(splitHyphenList, manRemove, cacheSize, mapped)) as executor:
+        # map gives the results back in piece order
+        for piece, pieceStats in zip(pieces, executor.map(cleanShard, pieces)):
+            yield piece[0], piece[3], pieceStats
+
+# ---------------------------------------------------------------------- #
+
+
+def joinPieces(pieces, outFile, stats):
+    """
+    Adds the tokens of each (inputFile, pieceFile, stats) piece to the open file outFile, and its stats to stats
+    The piece files are removed once they have been added
+    """
+
+    separator = ''
+    for inputFile, pieceFile, pieceStats in pieces:
+        mergeStats(stats, pieceStats)
+        # a piece has no new line after its last token, so put one between pieces that have tokens
+        if os.path.getsize(pieceFile):
+            outFile.write(separator)
+            with open(pieceFile, 'r') as piece_file:
+                shutil.copyfileobj(piece_file, outFile)
+            separator = '\n'
+        os.remove(pieceFile)
+
+# ---------------------------------------------------------------------- #
+
+
+def cleanInParallel(files, outputFile, stats, splitHyphenList, manRemove, jobs, shardSize=SHARD_SIZE,
+                    cacheSize=CACHE_SIZE, mapped=False):
+    """
+    Cleans files with jobs worker processes, splitting big files into pieces of about shardSize bytes
+    The pieces are joined in corpus order, so outputFile is exactly what cleaning the files one after the other would give
+    The stats of every piece are added to stats
+    """
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(outputFile) or '.') as pieceFolder, \
+            open(outputFile, 'w') as outFile:
+        pieces = cleanPieces(files, pieceFolder, splitHyphenList, manRemove, jobs, shardSize, cacheSize, mapped)
+        joinPieces(pieces, outFile, stats)
+
+# ---------------------------------------------------------------------- #
+
+# ----- CLEANING INCREMENTALLY ----- #
+
+# counts that belong to a run rather than to a file, so they aren't kept with a file's shard
+RUN_COUNTS = ('written', 'cacheHits', 'cacheMisses')
+
+
+def keepFileStats(entry, fileStats, stats):
+    """
+    Stores the stats of a file that has just been cleaned in its manifest entry,
+    and adds the counts that belong to this run to stats
+    """
+
+    for count in RUN_COUNTS:
+        if count != 'written':
+            stats['counts'][count] += fileStats['counts'][count]
+        fileStats['counts'].pop(count, None)
+    entry['stats'] = {name: dict(counter) for name, counter in fileStats.items()}
+
+# ---------------------------------------------------------------------- #
+
+
+def cleanChangedFiles(plan, shardFolder, stats, jobs, shardSize=SHARD_SIZE, cacheSize=CACHE_SIZE, mapped=False):
+    """
+    Cleans every file the plan marks as changed into its own shard, without the manual lists
+    Shards are written under a temporary name and renamed when done, so an interrupted run leaves no half shards
+    """
+
+    changed = [(inputFile, record) for inputFile, key, record, isChanged in plan if isChanged]
+    records = dict(changed)
+
+    if jobs > 1:
+        with tempfile.TemporaryDirectory(dir=shardFolder) as pieceFolder:
+            pieces = cleanPieces([inputFile for inputFile, record in changed], pieceFolder, None, None, jobs,
+                                 shardSize, cacheSize, mapped)
+            # the pieces of a file come one after the other, so they can be joined file by file
+            for inputFile, filePieces in groupby(pieces, key=itemgetter(0)):
+                record = records[inputFile]
+                fileStats = newStats()
+                tempPath = shardPath(shardFolder, record) + '.tmp'
+                with open(tempPath, 'w') as outFile:
+                    joinPieces(filePieces, outFile, fileStats)
+                os.replace(tempPath, shardPath(shardFolder, record))
+                keepFileStats(record, fileStats, stats)
+    else:
+        # one cleaner for all the files, so its cache carries over from file to file
+        clean = compileCleaner(cacheSize=cacheSize)
+        read = readWordsMapped if mapped else readWords
+        for inputFile, record in changed:
+            fileStats = newStats()
+            tempPath = shardPath(shardFolder, record) + '.tmp'
+            writeTokens(applyCleaner(read([inputFile], fileStats), fileStats, clean), tempPath, fileStats)
+            os.replace(tempPath, shardPath(shardFolder, record))
+            keepFileStats(record, fileStats, stats)
+
+# ---------------------------------------------------------------------- #
+
+
+def readShards(shardFiles):
+    """
+    Yields the tokens of each shard in turn, one token per line
+    Lines are read in blocks of about a MB. Tokens never have white space in them,
+    so splitlines can't split a token in two
+    """
+
+    for shardFile in shardFiles:
+        with open(shardFile, 'r') as shard_file:
+            for lines in iter(lambda: shard_file.readlines(1 << 20), []):
+                yield from ''.join(lines).splitlines()
+
+# ---------------------------------------------------------------------- #
+
+
+def cleanIncrementally(files, inputFolder, outputFolder, stats, splitHyphenList=None, manRemove=None, jobs=1,
+                       shardSize=SHARD_SIZE, cacheSize=CACHE_SIZE, mapped=False):
+    """
+    Cleans only the files that are new or have changed since the last --incremental run into shards,
+    and returns the tokens of every shard in corpus order with the manual lists applied
+    The stats of every file, cleaned now or before, are added to stats
+    """
+
+    shardFolder = os.path.join(outputFolder, SHARD_FOLDER_NAME)
+    os.makedirs(shardFolder, exist_ok=True)
+    manifest = loadCleaningManifest(shardFolder)
+    rules = cleaningRulesHash()
+    plan = planCleaning(files, inputFolder, manifest, rules, shardFolder)
+    print('Cleaning {} of {} files'.format(sum(isChanged for *_, isChanged in plan), len(plan)))
+
+    cleanChangedFiles(plan, shardFolder, stats, jobs, shardSize, cacheSize, mapped)
+
+    # files that have been deleted drop out of the manifest here
+    manifest['rules'] = rules
+    manifest['files'] = {key: record for inputFile, key, record, isChanged in plan}
+    saveCleaningManifest(shardFolder, manifest)
+    removeUnusedShards(shardFolder, manifest)
+
+    for record in manifest['files'].values():
+        mergeStats(stats, record['stats'])
+    tokens = readShards([shardPath(shardFolder, record) for inputFile, key, record, isChanged in plan])
+    if splitHyphenList is not None:
+        tokens = splitMarkedHyphens(tokens, splitHyphenList)
+    if manRemove is not None:
+        tokens = countMarkedRemovals(tokens, stats, manRemove)
+    return tokens
+
+# ---------------------------------------------------------------------- #
+
+# ----- MAIN FUNCTION ----- #
+
+
+def main():
+    parser = ArgumentParser(description="Cleans all .txt files in a folder into a single corpus, manCleanTIW.txt.")
+    parser.add_argument('-i', '--input_dir', help='Directory of .txt files, manRemnants.csv and remnants_ann.csv',
+                        type=str, default='./step2/input/')
+    parser.add_argument('-o', '--output_dir', help='Where manCleanTIW.txt will be saved', type=str,
+                        default='./step2/output/')
+    # how many worker processes to clean with, big files are split into pieces so they can be shared out
+    parser.add_argument('-j', '--jobs', help='Number of processes to clean with', type=int, default=1)
+    parser.add_argument('--shard-size', help='Size in MB of the pieces big files are split into for --jobs',
+                        type=float, default=SHARD_SIZE / (1 << 20))
+    # remembering how common words were cleaned saves cleaning them again, 0 turns it off
+    parser.add_argument('--cache-size', help='Number of distinct words to remember the cleaned result for',
+                        type=int, default=CACHE_SIZE)
+    # reads big files a MB at a time through a memory map instead of line by line
+    parser.add_argument('--mmap', help='Read the input files in large memory mapped batches', action='store_true')
+    # keeps each file's cleaned tokens, so a re-run only cleans the files that have changed
+    parser.add_argument('--incremental', help='Only clean files that are new or changed since the last run',
+                        action='store_true')
+    # manCleanTIW.vocab and manCleanTIW.ids hold the corpus as integer ids, which TIW_Experiments.py loads faster
+    parser.add_argument('--vocab', help='Also save the corpus as a vocabulary and token ids', action='store_true')
+    # for finding out which step takes the time, or removes the tokens, when a corpus behaves oddly
+    parser.add_argument('--stats', help='Clean step by step and write the tokens and types in and out of every step, '
+                                        'and its time, to this JSON file', type=str)
+    parser.add_argument('--profile', help='Profile the cleaning with cProfile and save the profile to this file '
+                                          '(only this process is profiled, not the --jobs workers)', type=str)
+    args = parser.parse_args()
+    if args.stats and (args.jobs > 1 or args.incremental):
+        parser.error('--stats cleans step by step in one process, so it can\'t be used with --jobs or --incremental')
+
+    inputFolder = args.input_dir
+    outputFolder = args.output_dir
+    jobs = args.jobs
+    shardSize = max(1, int(args.shard_size * (1 << 20)))
+    cacheSize = args.cache_size
+    mapped = args.mmap
+    corpus = Corpus() if args.vocab else None
+    os.makedirs(outputFolder, exist_ok=True)
+
+    stats = newStats()
+    # parsed again only when one of the CSVs has changed since the last run
+    splitHyphenList, manRemove = loadAnnotationRules(inputFolder, outputFolder)
+
+    # go over every .txt file in inputFolder, including subfolders
+    files = iterFiles(inputFolder, extensions=('.txt',))
+    outputFile = os.path.join(outputFolder, 'manCleanTIW.txt')
+    profiler = None
+    if args.profile:
+        # only imported when asked for
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+
+    if args.stats:
+        stageStats = []
+        words = readWordsMapped(files, stats) if mapped else readWords(files, stats)
+        tokens = cleanTokensMeasured(words, stats, stageStats, splitHyphenList, manRemove)
+        if corpus is not None:
+            tokens = internTokens(tokens, corpus)
+        writeTokens(tokens, outputFile, stats)
+    elif args.incremental:
+        tokens = cleanIncrementally(files, inputFolder, outputFolder, stats, splitHyphenList, manRemove, jobs,
+                                    shardSize, cacheSize, mapped)
+        if corpus is not None:
+            tokens = internTokens(tokens, corpus)
+        writeTokens(tokens, outputFile, stats)
+    elif jobs > 1:
+        cleanInParallel(files, outputFile, stats, splitHyphenList, manRemove, jobs, shardSize, cacheSize, mapped)
+        if corpus is not None:
+            # the pieces were written by the workers, so read the joined corpus back in
+            with open(outputFile, 'r') as outFile:
+                for line in outFile:
+                    corpus.extend(line.split())
+    else:
+        words = readWordsMapped(files, stats) if mapped else readWords(files, stats)
+        tokens = cleanTokens(words, stats, splitHyphenList, manRemove, cacheSize)
+        if corpus is not None:
+            tokens = internTokens(tokens, corpus)
+        writeTokens(tokens, outputFile, stats)
+    if corpus is not None:
+        corpus.save(os.path.splitext(outputFile)[0], outputFile)
+
+    seconds = time.perf_counter() - start
+    if profiler is not None:
+        profiler.disable()
+        import pstats
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+    if args.stats:
+        writeStageStats(args.stats, stageStats, stats, seconds)
+
+    print(f"Length of list containing all words is {stats['counts']['words']}")
+    # the steps --stats cleans with have no cache
+    if cacheSize and not args.stats:
+        print(f"Cleaning cache: {stats['counts']['cacheHits']} hits, {stats['counts']['cacheMisses']} misses")
+    print(f"we have {stats['counts']['written'] - sum(stats['manRemove'].values())} valid tokens")
+    if corpus is not None:
+        print(f"Saved {len(corpus)} tokens of {len(corpus.vocabulary)} types")
+    print('done')
+
+# ---------------------------------------------------------------------- #
+
+
+if __name__ == '__main__':
+    main()
 
 
 '''
 # Scraps that might be helpful when working with a new dataset
-    
-# to clean: 
-ü
-    
-
-û
-      
-ð
-
-       
-       
-      
-
-
-
+
+# to clean:
+ü
+
+
+û
+
+ð
+
+
+
+
+
+
+
 ☐
-
-
-
-
-
-
-
-# Remove unneccessary variables to save memory
-# Highly recommended when working with limited memory/drive
-
-del lowerTokens
-del strippedTokensList
-del splitTokensList
-del splitRetokenizeList
-del noNum
-del num
-del stripExNum
-del exNum
-del stripNum
-del stripNumRetok
-del stripExAlpha
 
-#############
 
-# Check for cleaning errors
 
-variables = [splitRetokenizeList, noNum, stripExNum, stripNumRetok, stripExAlpha, final_tokens]        
-checkLists = ['enari']
 
-for step in variables:
-    print('Checking:', step)
-    for token in step:
-        if token in checkLists:
-            print(token, 'is in', step)
 
-for token in step:
+
+
+# Check for cleaning errors
+# chain the steps by hand and look at what comes out of each one
+
+checkLists = ['enari']
+stats = newStats()
+for token in removeExerciseNumbers(removeNumbers(splitTokens(stripTokens(lowerTokens(
+        readWords(iterFiles(inputFolder, extensions=('.txt',)), stats)))), stats), stats):
     if token in checkLists:
-        print(token, 'is in', step)
-        
+        print(token, 'is in', 'stripExNum')
 
 #############
 
@@ -369,7 +892,7 @@ for word in final_tokens:
         engRemoved.append(word)
     else:
         eng.append(word)
-        
+
 # Search TIW for Javanese lexical items
 
 javInTIW = []
@@ -379,7 +902,7 @@ for word in TIWlexicon:
         javInTIW.append(word)
 
 print(javInTIW[200:300])
-              
+
 
 count = 0
 for word in minus3Ind:
@@ -389,4 +912,4 @@ for word in minus3Ind:
     else:
         print('word not found')
 
-'''
\ No newline at end of file
+'''
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+
+"""
+Long-lived extraction workers for convertToText
+Each worker process is started once and then handed batches of files.
+PDFs are read by calling pdftotext directly, and every image and scanned PDF page
+in a batch is OCRed by a single tesseract process, so the language models are
+loaded once per batch rather than once per file
+"""
+
+# ----- LIBRARIES ----- #
+import importlib
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+# ---------------------------------------------------------------------- #
+
+# ----- PRE-DEFINED CONSTANTS ----- #
+
+# file types the workers extract themselves, anything else goes through textract as usual
+DIRECT_TYPES = ('.pdf', '.png', '.jpeg', '.jpg')
+IMAGE_TYPES = ('.png', '.jpeg', '.jpg')
+
+# resolution scanned pages are rendered at before OCR
+OCR_RESOLUTION = 300
+
+# tesseract puts this between pages, so the text of each image in a batch can be told apart
+PAGE_MARKER = '<<<convertToText-page>>>'
+
+# paths of the command line tools, found once when the worker starts
+ENGINES = {}
+
+# ---------------------------------------------------------------------- #
+
+# ----- HELPER FUNCTIONS ----- #
+
+
+def warmUpWorker():
+    """
+    Runs once in each worker process when the pool starts
+    Loads the Python backends and looks up the command line tools up front,
+    so the files that follow don't pay for it
+    A backend that isn't installed is skipped, PDFs and images only need the command line tools,
+    and the other files report it when they are converted
+    """
+
+    # imported for their start up cost only, the workers hand them files later
+    for backend in ('docx2python', 'pdfplumber', 'textract'):
+        try:
+            importlib.import_module(backend)
+        except ImportError:
+            pass
+
+    for tool in ('pdftotext', 'pdftoppm', 'tesseract'):
+        ENGINES[tool] = shutil.which(tool) or tool
+
+# ---------------------------------------------------------------------- #
+
+
+def engine(tool):
+    """
+    Path of a command line tool, for when warmUpWorker hasn't been run
+    """
+
+    if tool not in ENGINES:
+        ENGINES[tool] = shutil.which(tool) or tool
+    return ENGINES[tool]
+
+# ---------------------------------------------------------------------- #
+
+
+def pdfToText(inputFile):
+    """
+    Extract the text layer of a PDF with pdftotext, without going through textract
+    """
+
+    result = subprocess.run([engine('pdftotext'), inputFile, '-'],
+                            check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    return result.stdout.decode("utf-8")
+
+# ---------------------------------------------------------------------- #
+
+
+def renderPDFPage(inputFile, pageNumber, imagePrefix):
+    """
+    Render a single page of a PDF to imagePrefix.png so it can be OCRed
+    """
+
+    subprocess.run([engine('pdftoppm'), '-f', str(pageNumber), '-l', str(pageNumber), '-r', str(OCR_RESOLUTION),
+                    '-png', '-singlefile', inputFile, imagePrefix],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return imagePrefix + '.png'
+
+# ---------------------------------------------------------------------- #
+
+
+def ocrImages(images, language, workFolder):
+    """
+    OCR a list of images with one tesseract process
+    Returns the text of each image in order, without a form feed after it
+    """
+
+    if not images:
+        return []
+
+    # tesseract reads a list of images from a text file
+    listFile = os.path.join(workFolder, 'images-{}.txt'.format(language))
+    with open(listFile, 'w') as list_file:
+        list_file.write('\n'.join(images) + '\n')
+
+    result = subprocess.run([engine('tesseract'), listFile, 'stdout', '-l', language,
+                             '-c', 'page_separator=' + PAGE_MARKER],
+                            check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    texts = result.stdout.decode("utf-8").split(PAGE_MARKER)
+    # newer tesseracts put the separator after every page, older ones only between pages
+    if len(texts) == len(images) + 1 and not texts[-1].strip():
+        texts.pop()
+    if len(texts) != len(images):
+        raise RuntimeError('tesseract gave {} pages for {} images'.format(len(texts), len(images)))
+    return texts
+
+# ---------------------------------------------------------------------- #
+
+
+def ocrInBatch(jobs, workFolder):
+    """
+    OCR every queued (inputFile, image, language) at once, one tesseract process per language
+    If a batch fails, the images are OCRed one at a time so only the broken file is lost
+    Returns ({(inputFile, image): text}, {inputFile: error}, {inputFile: seconds})
+    """
+
+    texts = {}
+    errors = {}
+    timings = {}
+
+    for language in sorted(set(job[2] for job in jobs)):
+        batch = [job for job in jobs if job[2] == language]
+        start = time.perf_counter()
+        try:
+            results = ocrImages([job[1] for job in batch], language, workFolder)
+        except Exception:
+            results = []
+            for inputFile, image, _ in batch:
+                try:
+                    results.extend(ocrImages([image], language, workFolder))
+                # anything from a failed tesseract to a missing one or output that isn't UTF-8
+                except Exception as error:
+                    errors[inputFile] = '{}: {}'.format(type(error).__name__, error)
+                    results.append('')
+        # share the time of the tesseract process between the images it read
+        share = (time.perf_counter() - start) / len(batch)
+        for (inputFile, image, _), text in zip(batch, results):
+            texts[(inputFile, image)] = text
+            timings[inputFile] = timings.get(inputFile, 0) + share
+
+    return texts, errors, timings
+
+# ---------------------------------------------------------------------- #
+
+
+def extractBatch(files, pdfLanguage='eng', imageLanguage='eng+ind', reports=None):
+    """
+    Extract the text of a batch of PDFs and images
+    Text layers come straight from pdftotext. Images and PDF pages with no text layer
+    are OCRed together at the end of the batch and put back in their place
+    If reports is a dict, it gets the backend, page count and number of OCRed pages of each file
+    Returns ({inputFile: doc}, {inputFile: error}, {inputFile: seconds spent extracting})
+    """
+
+    if reports is None:
+        reports = {}
+
+    docs = {}
+    errors = {}
+    timings = {}
+    # the pages of each PDF, and the images of its pages that are waiting for OCR
+    pdfPages = {}
+    scannedPages = {}
+    ocrJobs = []
+
+    with tempfile.TemporaryDirectory() as workFolder:
+        for fileNumber, inputFile in enumerate(files):
+            fileExtension = os.path.splitext(inputFile)[1]
+            start = time.perf_counter()
+            try:
+                if fileExtension in IMAGE_TYPES:
+                    ocrJobs.append((inputFile, inputFile, imageLanguage))
+                    reports[inputFile] = {'backend': 'tesseract', 'pages': 1, 'ocr_pages': 1}
+                else:
+                    # pdftotext ends every page with a form feed
+                    reports[inputFile] = {'backend': 'pdftotext'}
+                    pages = pdfToText(inputFile).split('\f')
+                    pdfPages[inputFile] = pages
+                    scannedPages[inputFile] = []
+                    reports[inputFile]['pages'] = len(pages) - 1
+                    for index, page in enumerate(pages[:-1]):
+                        # if there's no text on the page it should just consist of white spaces
+                        if not page.strip():
+                            imagePrefix = os.path.join(workFolder, '{}-{}'.format(fileNumber, index + 1))
+                            image = renderPDFPage(inputFile, index + 1, imagePrefix)
+                            scannedPages[inputFile].append((index, image))
+                            ocrJobs.append((inputFile, image, pdfLanguage))
+                    reports[inputFile]['ocr_pages'] = len(scannedPages[inputFile])
+                    reports[inputFile]['ocr_fallback'] = bool(scannedPages[inputFile])
+            # a broken file, a missing tool or output that isn't UTF-8 only loses this file, like in convertFile
+            except Exception as error:
+                errors[inputFile] = '{}: {}'.format(type(error).__name__, error)
+            timings[inputFile] = time.perf_counter() - start
+
+        texts, ocrErrors, ocrTimings = ocrInBatch(ocrJobs, workFolder)
+
+    errors.update(ocrErrors)
+    for inputFile, seconds in ocrTimings.items():
+        timings[inputFile] += seconds
+
+    for inputFile in files:
+        if inputFile in errors:
+            continue
+        if inputFile in pdfPages:
+            pages = pdfPages[inputFile]
+            for index, image in scannedPages[inputFile]:
+                pages[index] = texts[(inputFile, image)]
+            docs[inputFile] = '\f'.join(pages)
+        else:
+            # an image OCRed on its own ends in a form feed, as it does through textract
+            docs[inputFile] = texts[(inputFile, inputFile)] + '\f'
+
+    return docs, errors, timings
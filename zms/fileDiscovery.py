@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+"""
+Finds the input files for the zms scripts
+Walks a folder and its subfolders with os.scandir and hands out files as it finds them,
+so the scripts can start work before a big tree has been walked to the end
+"""
+
+# ----- LIBRARIES ----- #
+import os
+# ---------------------------------------------------------------------- #
+
+# ----- HELPER FUNCTIONS ----- #
+
+
+def iterFiles(inputFolder, extensions=None, excludeExtensions=None, skipHidden=True):
+    """
+    Yields the path of every file in inputFolder, including files in subfolders
+    Entries are visited in name order, going into each subfolder where it comes in that order,
+    so the same tree always gives the same files in the same order
+        extensions        - only yield files with one of these extensions, e.g. ('.txt',)
+        excludeExtensions - never yield files with one of these extensions
+        skipHidden        - leave out files and folders whose name starts with '.'
+    """
+
+    # read the whole folder listing first, so only one folder is open at a time however deep the tree is
+    with os.scandir(inputFolder) as scan:
+        entries = sorted(scan, key=lambda entry: entry.name)
+
+    for entry in entries:
+        if skipHidden and entry.name.startswith('.'):
+            continue
+        # is_dir() uses the information scandir already has, so there's no extra stat for most entries
+        if entry.is_dir():
+            yield from iterFiles(entry.path, extensions, excludeExtensions, skipHidden)
+            continue
+        fileExtension = os.path.splitext(entry.name)[1]
+        if extensions is not None and fileExtension not in extensions:
+            continue
+        if excludeExtensions is not None and fileExtension in excludeExtensions:
+            continue
+        yield entry.path
+
+# ---------------------------------------------------------------------- #
+
+
+def listOfFiles(inputFolder):
+    """
+    Gets a list of files from inputFolder, including files in subfolders
+    """
+
+    return list(iterFiles(inputFolder, skipHidden=False))
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Answers "which corpus types (or tokens) are in these lexicons and not in those" without going over the corpus again
+Every type of a corpus (see vocabulary.py) gets one bitmask, with a bit set for each lexicon that contains it.
+The masks are made in one pass over the types, so adding a lexicon adds a bit, not another pass over the corpus.
+A query such as "in googleJav but in none of the English lexicons" is then a test on the bits of each distinct mask,
+and the types and tokens it picks out are gathered from the corpus ids in C
+"""
+
+# ----- LIBRARIES ----- #
+from itertools import compress
+# ---------------------------------------------------------------------- #
+
+# ----- HELPER FUNCTIONS ----- #
+
+
+class LexiconIndex:
+    """
+    Membership bitmasks of the types of a vocabulary.Corpus in a set of lexicons
+    lexicons is {name: set of words}, anything that supports `word in lexicon` will do
+    """
+
+    def __init__(self, corpus, lexicons):
+        self.corpus = corpus
+        self.bits = {}
+        for name in lexicons:
+            self.bits[name] = 1 << len(self.bits)
+
+        # one pass over the types, looking each one up in every lexicon
+        tests = [(self.bits[name], lexicon) for name, lexicon in lexicons.items()]
+        self.masks = [sum(bit for bit, lexicon in tests if word in lexicon) for word in corpus.vocabulary.types]
+
+    def addLexicon(self, name, lexicon):
+        """
+        Adds one more lexicon, looking up every type in it
+        """
+
+        bit = self.bits[name] = 1 << len(self.bits)
+        self.masks = [mask | bit if word in lexicon else mask
+                      for word, mask in zip(self.corpus.vocabulary.types, self.masks)]
+
+    def mask(self, names):
+        """
+        The bits of the named lexicons together
+        """
+
+        mask = 0
+        for name in names:
+            mask |= self.bits[name]
+        return mask
+
+    def selected(self, anyOf=(), allOf=(), noneOf=()):
+        """
+        One byte per type, 1 if the type is in at least one of the anyOf lexicons (if any are given),
+        in all of the allOf lexicons, and in none of the noneOf lexicons
+        """
+
+        anyMask = self.mask(anyOf)
+        allMask = self.mask(allOf)
+        noneMask = self.mask(noneOf)
+        # there are far fewer distinct masks than types, so each is only tested once
+        table = {mask: (not anyMask or mask & anyMask != 0) and mask & allMask == allMask and not mask & noneMask
+                 for mask in set(self.masks)}
+        return bytes(map(table.__getitem__, self.masks))
+
+    def types(self, anyOf=(), allOf=(), noneOf=()):
+        """
+        Set of the types picked out by the query (see selected)
+        """
+
+        return set(compress(self.corpus.vocabulary.types, self.selected(anyOf, allOf, noneOf)))
+
+    def tokens(self, anyOf=(), allOf=(), noneOf=()):
+        """
+        List of the tokens picked out by the query, in corpus order and with repeats
+        """
+
+        selected = self.selected(anyOf, allOf, noneOf)
+        return list(compress(self.corpus, map(selected.__getitem__, self.corpus.ids)))
+
+    def tokenCount(self, anyOf=(), allOf=(), noneOf=()):
+        """
+        Number of tokens picked out by the query, from the type counts
+        """
+
+        return sum(compress(self.corpus.vocabulary.counts, self.selected(anyOf, allOf, noneOf)))
+
+    def frequencies(self, anyOf=(), allOf=(), noneOf=()):
+        """
+        {type: number of tokens} for the types picked out by the query, e.g. for nltk's FreqDist
+        """
+
+        selected = self.selected(anyOf, allOf, noneOf)
+        vocabulary = self.corpus.vocabulary
+        return dict(zip(compress(vocabulary.types, selected), compress(vocabulary.counts, selected)))
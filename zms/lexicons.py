@@ -0,0 +1,765 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Reads the external lexicons TIW_Experiments.py compares the corpus to, and keeps a compiled copy of each
+Every lexicon has its own parser for its source file (see LEXICONS). The first time a lexicon is loaded,
+its words are written to the lexicon folder as a sorted table of unique words:
+    <name>.lex  - the words in sorted order, one per line, UTF-8
+    <name>.idx  - where each word starts in the .lex file, 8 byte little endian, plus the size of the .lex file
+    <name>.json - the size, modification time and hash of the source file it was compiled from
+After that the compiled table is loaded instead, until the source file changes
+Loaded with compact=True, a lexicon is a CompactLexicon mapped straight onto its compiled files,
+rather than a frozenset of Python strings. Lexicons named in bloom are BloomLexicons: a Bloom filter
+(<name>.bloom, <name>.bloom.json) in front of the compiled files, for wordlists too big for either.
+Both kinds are compiled without holding all their words in memory, sorted a run at a time on disk and then merged
+"""
+
+# ----- LIBRARIES ----- #
+from array import array
+from bisect import bisect_right
+from collections.abc import Set
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import csv
+import hashlib
+from heapq import merge
+from itertools import accumulate, groupby, islice
+import json
+import math
+import mmap
+import multiprocessing
+from operator import itemgetter
+import os
+import sys
+import tempfile
+
+from annotationRules import readMarkedStrings
+from conversionManifest import sourceRecord
+# ---------------------------------------------------------------------- #
+
+# ----- PRE-DEFINED CONSTANTS ----- #
+
+# bump this if a parser or the compiled layout changes, lexicons compiled before are then compiled again
+# (version 2: engManual skips rows too short to have the marked column)
+LEXICON_VERSION = 2
+
+OFFSET_TYPE = 'Q'
+
+# a CompactLexicon keeps the first word of every block of this many words in memory,
+# a lookup searches the sample and then the one block the word can be in
+LEXICON_BLOCK = 64
+
+# number of words sorted in memory at a time when a lexicon is compiled a run at a time
+LEXICON_RUN = 1 << 20
+
+# share of the words not in a BloomLexicon that its filter lets through to the exact check
+BLOOM_FALSE_POSITIVE_RATE = 0.01
+# bump this if the hashing or the layout of the filter changes
+BLOOM_VERSION = 1
+
+# ---------------------------------------------------------------------- #
+
+# ----- PARSERS ----- #
+
+
+def readAllWords(path, encoding=None):
+    """
+    Every white space separated word of the file, lowercased
+    """
+
+    with open(path, 'r', encoding=encoding) as source_file:
+        for line in source_file:
+            for word in line.split():
+                yield word.lower()
+
+# ---------------------------------------------------------------------- #
+
+
+def readLineColumn(path, column=0, encoding=None):
+    """
+    The given white space separated column of every line, lowercased
+    """
+
+    with open(path, 'r', encoding=encoding) as source_file:
+        for line in source_file:
+            words = line.split()
+            # blank lines and lines too short to have the column
+            if len(words) > column:
+                yield words[column].lower()
+
+# ---------------------------------------------------------------------- #
+
+
+def readCSVColumn(path, column=0, delimiter=',', encoding=None):
+    """
+    The given column of every row of a CSV or TSV, lowercased
+    """
+
+    with open(path, 'r', encoding=encoding) as source_file:
+        for row in csv.reader(source_file, delimiter=delimiter):
+            if len(row) > column:
+                yield row[column].lower()
+
+# ---------------------------------------------------------------------- #
+
+
+# ----- SOURCES ----- #
+
+# name: (source file in the input folder, parser, parser options)
+LEXICONS = {
+    # Mac dictionary file: /usr/share/dict/words (which is an alias of /usr/share/dict/web2)
+    'eng': ('web2', readAllWords, {}),
+    # CMU lexicon: http://www.speech.cs.cmu.edu/cgi-bin/cmudict?in=complex
+    'engCMU': ('cmudict-0.7b.txt', readLineColumn, {'column': 0, 'encoding': 'latin-1'}),
+    # Australian English pronunciation dictionary: https://github.com/twocs/australian-lexicon/find/master
+    'engAus': ('australian-english-lexicon.txt', readLineColumn, {'column': 0, 'encoding': 'latin-1'}),
+    # English marked up with 1 in the third column of the annotation csv from the previous cleaning step (not lowercased)
+    'engManual': ('remnants_ann.csv', readMarkedStrings, {'column': 2}),
+    # Bahasa Wordnet: https://sourceforge.net/p/wn-msa/tab/HEAD/tree/trunk/wn-msa-all.tab
+    'wordnetInd': ('wn-msa-all.tab', readCSVColumn, {'column': 3, 'delimiter': '\t'}),
+    # slang Indonesian and its formal translations:
+    # https://github.com/nasalsabila/kamus-alay/blob/master/colloquial-indonesian-lexicon.csv
+    'collIndInternet': ('colloquial-indonesian-lexicon.csv', readCSVColumn, {'column': 0}),
+    'collIndInternetFormal': ('colloquial-indonesian-lexicon.csv', readCSVColumn, {'column': 1}),
+    # Korpus Indonesia: https://korpusindonesia.kemdikbud.go.id
+    'KOINInd': ('30000_KOIN.txt', readLineColumn, {'column': 1}),
+    # Google Javanese lexicon: https://github.com/google/language-resources/blob/master/jv/data/lexicon.tsv
+    'googleJav': ('jav_lexicon.tsv', readCSVColumn, {'column': 0, 'delimiter': '\t'}),
+    # Google Sundanese lexicon: https://github.com/google/language-resources/blob/master/su/data/lexicon.tsv
+    'googleSund': ('sund_lexicon.tsv', readCSVColumn, {'column': 0, 'delimiter': '\t'}),
+}
+
+# ---------------------------------------------------------------------- #
+
+# ----- COMPILED LEXICONS ----- #
+
+
+def lexiconPaths(lexiconFolder, name):
+    """
+    The .lex, .idx and .json files of a compiled lexicon
+    """
+
+    base = os.path.join(lexiconFolder, name)
+    return base + '.lex', base + '.idx', base + '.json'
+
+# ---------------------------------------------------------------------- #
+
+
+def lexiconWords(name, inputFolder):
+    """
+    The words of a lexicon as its parser reads them from its source file, repeats included
+    """
+
+    sourceName, parser, options = LEXICONS[name]
+    return parser(os.path.join(inputFolder, sourceName), **options)
+
+# ---------------------------------------------------------------------- #
+
+
+def parseLexicon(name, inputFolder):
+    """
+    Reads a lexicon from its source file
+    Returns its words as a frozenset
+    """
+
+    return frozenset(lexiconWords(name, inputFolder))
+
+# ---------------------------------------------------------------------- #
+
+
+def writeLexicon(lexiconFolder, name, words, record):
+    """
+    Writes the sorted unique words of a lexicon to its .lex and .idx files, and record to its .json file
+    Words with a new line in them can't be stored one per line, and can never match a corpus token, so they are left out
+    """
+
+    writeSortedLexicon(lexiconFolder, name, sorted(word for word in words if '\n' not in word), record)
+
+# ---------------------------------------------------------------------- #
+
+
+def sortedRuns(words, workFolder, runSize=LEXICON_RUN):
+    """
+    Sorts words runSize at a time, dropping repeats, and writes each run to its own file in workFolder
+    Returns the paths of the runs
+    """
+
+    words = (word for word in words if '\n' not in word)
+    runs = []
+    while True:
+        run = sorted(set(islice(words, runSize)))
+        if not run:
+            return runs
+        runs.append(os.path.join(workFolder, '{}.run'.format(len(runs))))
+        with open(runs[-1], 'wb') as runFile:
+            runFile.writelines(word.encode('utf-8') + b'\n' for word in run)
+
+# ---------------------------------------------------------------------- #
+
+
+def readRun(path):
+    """
+    The words of a run written by sortedRuns, in order
+    """
+
+    with open(path, 'rb') as runFile:
+        for line in runFile:
+            yield line[:-1].decode('utf-8')
+
+# ---------------------------------------------------------------------- #
+
+
+def externalSort(words, workFolder, runSize=LEXICON_RUN):
+    """
+    The unique words of an iterable in sorted order, with no more than runSize of them in memory at a time
+    The sorted runs on disk are merged, and repeats across runs dropped, as they are read back
+    """
+
+    runs = [readRun(path) for path in sortedRuns(words, workFolder, runSize)]
+    return map(itemgetter(0), groupby(merge(*runs)))
+
+# ---------------------------------------------------------------------- #
+
+
+def writeSortedLexicon(lexiconFolder, name, words, record):
+    """
+    Writes words, which are already sorted and unique, to a lexicon's .lex and .idx files a word at a time,
+    and record to its .json file
+    The .json file is written last, so a lexicon that was only half written is compiled again
+    """
+
+    lexPath, idxPath, recordPath = lexiconPaths(lexiconFolder, name)
+    offsets = array(OFFSET_TYPE, [0])
+    with open(lexPath + '.tmp', 'wb') as lexFile:
+        for word in words:
+            data = word.encode('utf-8') + b'\n'
+            lexFile.write(data)
+            offsets.append(offsets[-1] + len(data))
+    if sys.byteorder == 'big':
+        offsets.byteswap()
+    with open(idxPath + '.tmp', 'wb') as idxFile:
+        offsets.tofile(idxFile)
+
+    os.replace(lexPath + '.tmp', lexPath)
+    os.replace(idxPath + '.tmp', idxPath)
+    with open(recordPath + '.tmp', 'w') as recordFile:
+        json.dump(record, recordFile, indent=1, sort_keys=True)
+    os.replace(recordPath + '.tmp', recordPath)
+
+# ---------------------------------------------------------------------- #
+
+
+def readCompiledLexicon(lexiconFolder, name):
+    """
+    Reads the words of a compiled lexicon back in as a frozenset
+    """
+
+    lexPath = lexiconPaths(lexiconFolder, name)[0]
+    with open(lexPath, 'rb') as lexFile:
+        data = lexFile.read()
+    # every word, including the last, is followed by a new line
+    return frozenset(data.decode('utf-8').split('\n')[:-1])
+
+# ---------------------------------------------------------------------- #
+
+
+def mergeSorted(first, second, keepFirst, keepBoth, keepSecond):
+    """
+    Walks two sorted iterables of unique words together, in one pass over each
+    Yields, in sorted order, the words only in first if keepFirst, those in both if keepBoth,
+    and those only in second if keepSecond
+    """
+
+    first = iter(first)
+    second = iter(second)
+    a = next(first, None)
+    b = next(second, None)
+    while a is not None and b is not None:
+        if a < b:
+            if keepFirst:
+                yield a
+            a = next(first, None)
+        elif b < a:
+            if keepSecond:
+                yield b
+            b = next(second, None)
+        else:
+            if keepBoth:
+                yield a
+            a = next(first, None)
+            b = next(second, None)
+
+    # whatever is left of the longer one
+    if keepFirst and a is not None:
+        yield a
+        yield from first
+    if keepSecond and b is not None:
+        yield b
+        yield from second
+
+# ---------------------------------------------------------------------- #
+
+
+class CompactLexicon(Set):
+    """
+    A read-only set of words kept as one packed, sorted string table instead of a Python string per word
+        data    - the words in sorted order, each followed by a new line, UTF-8
+        offsets - where each word starts in data, plus the length of data
+    Opened from a compiled lexicon (see open) the table is memory mapped, so it costs no memory of its own
+    and the operating system can share and drop its pages. Membership is a binary search over the first word
+    of every block of LEXICON_BLOCK words, then a search of that block.
+    &, |, - and ^ merge the sorted tables, with each other or with ordinary sets, into a new CompactLexicon
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+        self.size = len(offsets) - 1
+        # UTF-8 bytes sort in the same order as the strings they encode
+        self.sample = [self.key(position) for position in range(0, self.size, LEXICON_BLOCK)]
+        # where each block starts in data, and where the last one ends
+        self.bounds = list(offsets[:-1:LEXICON_BLOCK]) + [offsets[-1]]
+
+    @classmethod
+    def open(cls, lexiconFolder, name):
+        """
+        Maps the .lex and .idx files of a compiled lexicon
+        """
+
+        lexPath, idxPath, _ = lexiconPaths(lexiconFolder, name)
+        tables = []
+        for path in (lexPath, idxPath):
+            with open(path, 'rb') as tableFile:
+                # an empty lexicon has an empty .lex file, which can't be mapped
+                size = os.fstat(tableFile.fileno()).st_size
+                tables.append(mmap.mmap(tableFile.fileno(), 0, access=mmap.ACCESS_READ) if size else b'')
+        data, index = tables
+        if sys.byteorder == 'little':
+            offsets = memoryview(index).cast(OFFSET_TYPE)
+        else:
+            offsets = array(OFFSET_TYPE, index)
+            offsets.byteswap()
+        return cls(data, offsets)
+
+    @classmethod
+    def fromSorted(cls, words):
+        """
+        Packs an iterable of unique words, already in sorted order, into a table held in memory
+        """
+
+        words = [word.encode('utf-8') + b'\n' for word in words if '\n' not in word]
+        offsets = array(OFFSET_TYPE, [0])
+        offsets.extend(accumulate(map(len, words)))
+        return cls(b''.join(words), offsets)
+
+    @classmethod
+    def _from_iterable(cls, words):
+        # used by the methods Set provides, e.g. isdisjoint
+        return cls.fromSorted(sorted(set(words)))
+
+    def __len__(self):
+        return self.size
+
+    def key(self, position):
+        """
+        The word at this position in sorted order, as UTF-8 bytes
+        """
+
+        return self.data[self.offsets[position]:self.offsets[position + 1] - 1]
+
+    def __getitem__(self, position):
+        return self.key(position).decode('utf-8')
+
+    def __contains__(self, word):
+        if not isinstance(word, str):
+            return False
+        key = word.encode('utf-8', 'surrogatepass')
+        block = bisect_right(self.sample, key) - 1
+        if block < 0 or b'\n' in key:
+            return False
+        if self.sample[block] == key:
+            return True
+        # otherwise it comes after the first word of the block, so it follows a new line
+        return self.data.find(b'\n' + key + b'\n', self.bounds[block], self.bounds[block + 1]) >= 0
+
+    def __iter__(self):
+        # a block at a time, without decoding the whole table
+        for start, end in zip(self.bounds, self.bounds[1:]):
+            yield from self.data[start:end - 1].decode('utf-8').split('\n')
+
+    def __repr__(self):
+        return '{}({} words)'.format(type(self).__name__, len(self))
+
+    @staticmethod
+    def sortedWords(other):
+        # the words of the other operand in sorted order, sets are only sorted once
+        return other if isinstance(other, CompactLexicon) else sorted(other)
+
+    # a BloomLexicon operand is swapped for its compiled copy, so it is merged like any other CompactLexicon,
+    # and the words looked up here don't count towards the false positive rate it reports
+    def __and__(self, other):
+        if not isinstance(other, Set):
+            return NotImplemented
+        other = BloomLexicon.exactOf(other)
+        if isinstance(other, CompactLexicon):
+            return self.fromSorted(mergeSorted(self, other, False, True, False))
+        # going through this table keeps the words in order, and lookups in an ordinary set are cheap
+        return self.fromSorted(word for word in self if word in other)
+
+    def __or__(self, other):
+        if not isinstance(other, Set):
+            return NotImplemented
+        other = BloomLexicon.exactOf(other)
+        # merging the two and dropping repeats can all be done in C
+        return self.fromSorted(map(itemgetter(0), groupby(merge(self, self.sortedWords(other)))))
+
+    def __sub__(self, other):
+        if not isinstance(other, Set):
+            return NotImplemented
+        other = BloomLexicon.exactOf(other)
+        if isinstance(other, CompactLexicon):
+            return self.fromSorted(mergeSorted(self, other, True, False, False))
+        return self.fromSorted(word for word in self if word not in other)
+
+    def __xor__(self, other):
+        if not isinstance(other, Set):
+            return NotImplemented
+        other = BloomLexicon.exactOf(other)
+        return self.fromSorted(mergeSorted(self, self.sortedWords(other), True, False, True))
+
+    def __rsub__(self, other):
+        if not isinstance(other, Set):
+            return NotImplemented
+        other = BloomLexicon.exactOf(other)
+        return self.fromSorted(mergeSorted(self, self.sortedWords(other), False, False, True))
+
+    # the same either way round
+    __rand__ = __and__
+    __ror__ = __or__
+    __rxor__ = __xor__
+
+# ---------------------------------------------------------------------- #
+
+
+def bloomSize(words, falsePositiveRate):
+    """
+    Number of bits and of hashes for a Bloom filter of this many words to have this false positive rate
+    """
+
+    bits = max(8, math.ceil(-words * math.log(falsePositiveRate) / math.log(2) ** 2))
+    hashes = max(1, round(bits / max(1, words) * math.log(2)))
+    return bits, hashes
+
+# ---------------------------------------------------------------------- #
+
+
+def bloomPositions(word, bits, hashes):
+    """
+    The bits a word sets in a Bloom filter
+    blake2b rather than hash(), which changes from one run of Python to the next,
+    and its two halves are combined into as many hashes as needed (double hashing)
+    """
+
+    digest = hashlib.blake2b(word.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    first = int.from_bytes(digest[:8], 'little')
+    second = int.from_bytes(digest[8:], 'little') | 1
+    return [(first + number * second) % bits for number in range(hashes)]
+
+# ---------------------------------------------------------------------- #
+
+
+class BloomLexicon(Set):
+    """
+    A lexicon checked through a Bloom filter first, and only then against its compiled copy (a CompactLexicon)
+    Most words that aren't in the lexicon are turned away by the filter without touching the compiled copy,
+    the rest, and the words that are in it, are checked exactly, so the answers are always exact.
+    Every lookup is counted, so the false positive rate the filter actually gives can be reported
+    """
+
+    def __init__(self, filterBits, bits, hashes, exact, falsePositiveRate):
+        self.filterBits = filterBits
+        self.bits = bits
+        self.hashes = hashes
+        self.exact = exact
+        self.falsePositiveRate = falsePositiveRate
+        self.lookups = 0
+        self.passed = 0
+        self.found = 0
+
+    @classmethod
+    def build(cls, exact, falsePositiveRate=BLOOM_FALSE_POSITIVE_RATE):
+        """
+        Makes the filter for a CompactLexicon, going through its words once
+        """
+
+        bits, hashes = bloomSize(len(exact), falsePositiveRate)
+        filterBits = bytearray((bits + 7) // 8)
+        for word in exact:
+            for position in bloomPositions(word, bits, hashes):
+                filterBits[position >> 3] |= 1 << (position & 7)
+        return cls(filterBits, bits, hashes, exact, falsePositiveRate)
+
+    @classmethod
+    def open(cls, lexiconFolder, name, falsePositiveRate=BLOOM_FALSE_POSITIVE_RATE):
+        """
+        The filter of a compiled lexicon, made and saved the first time,
+        and made again when the lexicon is compiled again or the false positive rate changes
+        """
+
+        exact = CompactLexicon.open(lexiconFolder, name)
+        base = os.path.join(lexiconFolder, name)
+        with open(lexiconPaths(lexiconFolder, name)[2], 'r') as recordFile:
+            source = json.load(recordFile)['sha256']
+        record = {'version': BLOOM_VERSION, 'lexicon_version': LEXICON_VERSION, 'source': source,
+                  'rate': falsePositiveRate}
+
+        try:
+            with open(base + '.bloom.json', 'r') as recordFile:
+                saved = json.load(recordFile)
+        except (OSError, ValueError):
+            saved = {}
+        if all(saved.get(key) == value for key, value in record.items()) and os.path.exists(base + '.bloom'):
+            with open(base + '.bloom', 'rb') as bloomFile:
+                filterBits = mmap.mmap(bloomFile.fileno(), 0, access=mmap.ACCESS_READ)
+            return cls(filterBits, saved['bits'], saved['hashes'], exact, falsePositiveRate)
+
+        print('Making Bloom filter: {}'.format(name))
+        lexicon = cls.build(exact, falsePositiveRate)
+        with open(base + '.bloom.tmp', 'wb') as bloomFile:
+            bloomFile.write(lexicon.filterBits)
+        os.replace(base + '.bloom.tmp', base + '.bloom')
+        record.update(bits=lexicon.bits, hashes=lexicon.hashes, words=len(exact))
+        with open(base + '.bloom.json.tmp', 'w') as recordFile:
+            json.dump(record, recordFile, indent=1, sort_keys=True)
+        os.replace(base + '.bloom.json.tmp', base + '.bloom.json')
+        return lexicon
+
+    @classmethod
+    def _from_iterable(cls, words):
+        # the results of set operations are exact tables, there is no filter to go with them
+        return CompactLexicon._from_iterable(words)
+
+    @staticmethod
+    def exactOf(other):
+        # the compiled copy behind another BloomLexicon, so it isn't looked up word by word through its filter
+        return other.exact if isinstance(other, BloomLexicon) else other
+
+    # set operations are done on the compiled copies, as sorted merges, rather than sorting the words again
+    def __and__(self, other):
+        return self.exact.__and__(self.exactOf(other))
+
+    def __or__(self, other):
+        return self.exact.__or__(self.exactOf(other))
+
+    def __sub__(self, other):
+        return self.exact.__sub__(self.exactOf(other))
+
+    def __xor__(self, other):
+        return self.exact.__xor__(self.exactOf(other))
+
+    def __rsub__(self, other):
+        return self.exact.__rsub__(self.exactOf(other))
+
+    __rand__ = __and__
+    __ror__ = __or__
+    __rxor__ = __xor__
+
+    def __len__(self):
+        return len(self.exact)
+
+    def __iter__(self):
+        return iter(self.exact)
+
+    def __repr__(self):
+        return '{}({} words, {:.2%} false positive rate)'.format(type(self).__name__, len(self), self.falsePositiveRate)
+
+    def mayContain(self, word):
+        """
+        False if the word is certainly not in the lexicon, True if it might be
+        """
+
+        filterBits = self.filterBits
+        return all(filterBits[position >> 3] & (1 << (position & 7))
+                   for position in bloomPositions(word, self.bits, self.hashes))
+
+    def __contains__(self, word):
+        if not isinstance(word, str):
+            return False
+        self.lookups += 1
+        if not self.mayContain(word):
+            return False
+        self.passed += 1
+        if word not in self.exact:
+            return False
+        self.found += 1
+        return True
+
+    def measuredFalsePositiveRate(self):
+        """
+        Share of the words looked up that weren't in the lexicon but got through the filter, None before any
+        """
+
+        missing = self.lookups - self.found
+        return (self.passed - self.found) / missing if missing else None
+
+    def report(self):
+        """
+        One line on the lookups so far and the false positive rate they gave
+        """
+
+        measured = self.measuredFalsePositiveRate()
+        return '{:,} lookups, {:,} found, {:,} false positives ({} measured, {:.2%} configured)'.format(
+            self.lookups, self.found, self.passed - self.found,
+            'none' if measured is None else '{:.2%}'.format(measured), self.falsePositiveRate)
+
+# ---------------------------------------------------------------------- #
+
+
+def isCompiled(lexiconFolder, name, inputFolder):
+    """
+    True if the lexicon has been compiled from its source file as it is now, by this version of the parsers
+    Size and modification time are checked first, the source is only hashed when they differ
+    """
+
+    lexPath, idxPath, recordPath = lexiconPaths(lexiconFolder, name)
+    if not all(os.path.exists(path) for path in (lexPath, idxPath, recordPath)):
+        return False
+    try:
+        with open(recordPath, 'r') as recordFile:
+            record = json.load(recordFile)
+    except (OSError, ValueError):
+        return False
+    if record.get('version') != LEXICON_VERSION:
+        return False
+
+    sourcePath = os.path.join(inputFolder, LEXICONS[name][0])
+    stat = os.stat(sourcePath)
+    if record['size'] == stat.st_size and record['mtime'] == stat.st_mtime_ns:
+        return True
+    if record['sha256'] != sourceRecord(sourcePath, stat)['sha256']:
+        return False
+
+    # touched but not changed, just remember the new modification time
+    record['mtime'] = stat.st_mtime_ns
+    with open(recordPath + '.tmp', 'w') as recordFile:
+        json.dump(record, recordFile, indent=1, sort_keys=True)
+    os.replace(recordPath + '.tmp', recordPath)
+    return True
+
+# ---------------------------------------------------------------------- #
+
+
+def compileLexicon(name, inputFolder, lexiconFolder, stream=False):
+    """
+    Parses a lexicon from its source file and writes the compiled copy
+    Returns its words as a frozenset
+    With stream, the words are never all in memory at once: they are sorted a run at a time
+    in a work folder next to the compiled copy and merged from there, and None is returned
+    """
+
+    sourcePath = os.path.join(inputFolder, LEXICONS[name][0])
+    record = sourceRecord(sourcePath)
+    record['version'] = LEXICON_VERSION
+    if stream:
+        with tempfile.TemporaryDirectory(dir=lexiconFolder) as workFolder:
+            writeSortedLexicon(lexiconFolder, name, externalSort(lexiconWords(name, inputFolder), workFolder), record)
+        return None
+    words = parseLexicon(name, inputFolder)
+    writeLexicon(lexiconFolder, name, words, record)
+    return words
+
+# ---------------------------------------------------------------------- #
+
+
+def loadLexicon(name, inputFolder, lexiconFolder, compact=False, falsePositiveRate=None):
+    """
+    A lexicon's words as a frozenset, from its compiled copy if that is up to date,
+    otherwise from its source file (compiling it on the way)
+    With compact, the compiled copy is opened as a CompactLexicon instead,
+    and with a falsePositiveRate as a BloomLexicon
+    """
+
+    os.makedirs(lexiconFolder, exist_ok=True)
+    if isCompiled(lexiconFolder, name, inputFolder):
+        return openCompiledLexicon(lexiconFolder, name, compact, falsePositiveRate)
+    print('Compiling lexicon: {}'.format(name))
+    # CompactLexicons and BloomLexicons are opened from the compiled copy, so their words don't need to be kept
+    words = compileLexicon(name, inputFolder, lexiconFolder, stream=compact or bool(falsePositiveRate))
+    if compact or falsePositiveRate:
+        return openCompiledLexicon(lexiconFolder, name, compact, falsePositiveRate)
+    return words
+
+# ---------------------------------------------------------------------- #
+
+
+def openCompiledLexicon(lexiconFolder, name, compact=False, falsePositiveRate=None):
+    """
+    A compiled lexicon as a BloomLexicon if there is a falsePositiveRate, a CompactLexicon if compact,
+    otherwise read in as a frozenset
+    """
+
+    if falsePositiveRate:
+        return BloomLexicon.open(lexiconFolder, name, falsePositiveRate)
+    if compact:
+        return CompactLexicon.open(lexiconFolder, name)
+    return readCompiledLexicon(lexiconFolder, name)
+
+# ---------------------------------------------------------------------- #
+
+
+def compileLexiconFile(name, inputFolder, lexiconFolder, stream=False):
+    """
+    Compiles a lexicon inside a worker process, a run at a time with stream
+    Only the name is sent back, the words are read from the compiled copy instead of being pickled
+    """
+
+    compileLexicon(name, inputFolder, lexiconFolder, stream)
+    return name
+
+# ---------------------------------------------------------------------- #
+
+
+def loadLexicons(inputFolder, lexiconFolder, names=None, jobs=None, compact=False, bloom=(),
+                 falsePositiveRate=BLOOM_FALSE_POSITIVE_RATE):
+    """
+    {name: frozenset of words} for the given lexicons, or all of LEXICONS, loaded at the same time
+    With compact, {name: CompactLexicon} instead, and the lexicons named in bloom are BloomLexicons
+    with the given falsePositiveRate
+    Compiled copies are read by threads, which spend most of their time waiting for the disk.
+    Lexicons that have to be parsed are compiled in worker processes, as parsing holds the GIL,
+    while the compiled ones are being read
+    jobs is the number of threads and of processes, the number of CPUs by default, 1 loads one after the other
+    """
+
+    names = list(names or LEXICONS)
+    rates = {name: falsePositiveRate if name in bloom else None for name in names}
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1:
+        return {name: loadLexicon(name, inputFolder, lexiconFolder, compact, rates[name]) for name in names}
+
+    os.makedirs(lexiconFolder, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=jobs) as threads:
+        compiled = dict(zip(names, threads.map(lambda name: isCompiled(lexiconFolder, name, inputFolder), names)))
+    stale = [name for name in names if not compiled[name]]
+    for name in stale:
+        print('Compiling lexicon: {}'.format(name))
+
+    # worker processes are forked so they don't run the calling script again, and before any threads are started,
+    # where that isn't possible (Windows) the lexicons are compiled in threads instead
+    if stale and 'fork' in multiprocessing.get_all_start_methods():
+        compilers = ProcessPoolExecutor(max_workers=min(jobs, len(stale)),
+                                        mp_context=multiprocessing.get_context('fork'))
+    else:
+        compilers = ThreadPoolExecutor(max_workers=jobs)
+
+    with compilers, ThreadPoolExecutor(max_workers=jobs) as threads:
+        compiling = [compilers.submit(compileLexiconFile, name, inputFolder, lexiconFolder,
+                                      compact or rates[name] is not None)
+                     for name in stale]
+        reading = {name: threads.submit(openCompiledLexicon, lexiconFolder, name, compact, rates[name])
+                   for name in names if compiled[name]}
+        # read each lexicon back as soon as it is compiled
+        for future in as_completed(compiling):
+            name = future.result()
+            reading[name] = threads.submit(openCompiledLexicon, lexiconFolder, name, compact, rates[name])
+        return {name: reading[name].result() for name in names}
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+"""
+Compiles the clean up rules used by convertToText into one normaliser
+The rules are: mapping characters (ligatures, control characters) to other strings,
+stripping punctuation and collapsing repeated new lines.
+Punctuation stripping and the character mapping are folded into a single translate table,
+so a document only needs one pass plus the new line collapse
+"""
+
+# ----- LIBRARIES ----- #
+import re
+# ---------------------------------------------------------------------- #
+
+# ----- PRE-DEFINED CONSTANTS ----- #
+
+LIGATURES = {0xFB00: u'ff',
+             0xFB03: u'ffi',
+             0xFB04: u'ffl',
+             0xFB01: u'fi',
+             0xFB02: u'fl',
+             0x000C: u'\n',
+             0x008D: u'\n',
+             0x008F: u'\n',
+             0x0090: u'\n',
+             0x0082: u'\n',
+             0x0081: u'\n',
+             0x008a: u'\n',
+             0x0089: u'\n',
+             0x0088: u'\n',
+             0x0087: u'\n',
+             0x0086: u'\n',
+             0x0085: u'\n',
+             0x0084: u'\n',
+             0xF08D: u'',
+             0xF08F: u'',
+             0xF090: u'',
+             0xF082: u'',
+             0xF081: u'',
+             0xF08a: u'',
+             0xF089: u'',
+             0xF088: u'',
+             0xF087: u'',
+             0xF086: u'',
+             0xF085: u'',
+             0xF084: u''}
+
+REPEATED_NEW_LINES = re.compile(r'\n\n+')
+
+# ---------------------------------------------------------------------- #
+
+# ----- HELPER FUNCTIONS ----- #
+
+
+def isWordOrSpace(character):
+    """
+    True for the characters the regex [\\w\\s] matches, i.e. the ones punctuation stripping keeps
+    """
+
+    return character.isalnum() or character == '_' or character.isspace()
+
+# ---------------------------------------------------------------------- #
+
+
+class StripTable(dict):
+    """
+    Translation table that deletes every character that isn't a word character or white space
+    Each character is only checked the first time it is seen, after that it is a plain dict lookup
+    """
+
+    def __missing__(self, codePoint):
+        # translate keeps a character that maps to itself, and deletes one that maps to None
+        value = codePoint if isWordOrSpace(chr(codePoint)) else None
+        self[codePoint] = value
+        return value
+
+# ---------------------------------------------------------------------- #
+
+
+def compileNormalizer(mapping=LIGATURES, stripPunctuation=False, collapseNewlines=False):
+    r"""
+    Returns a function that gives the same result as running, in this order:
+        re.sub(r'[^\w\s]', '', doc)       if stripPunctuation
+        re.sub(r'\n\n*', '\n', doc)        if collapseNewlines
+        doc.translate(mapping)
+    When stripping punctuation, the stripping and most of the mapping happen in one translate call.
+    Mappings that would change how new lines collapse (ones that give '' or a new line)
+    have to wait until after the collapse, and are done with str.replace only if the document contains them
+    """
+
+    if not stripPunctuation:
+        # a collapse and a translate is already as few passes as these rules need
+        def normalize(doc):
+            if collapseNewlines:
+                doc = REPEATED_NEW_LINES.sub('\n', doc)
+            return doc.translate(mapping)
+
+        return normalize
+
+    table = StripTable()
+    deferred = []
+
+    for codePoint, value in mapping.items():
+        character = chr(codePoint)
+        # stripped characters never reach the mapping, so the table's own lookup deletes them
+        if not isWordOrSpace(character):
+            continue
+        if not collapseNewlines or (value and '\n' not in value and character != '\n'):
+            table[codePoint] = value
+        else:
+            deferred.append((character, value))
+
+    def normalize(doc):
+        doc = doc.translate(table)
+        if collapseNewlines:
+            doc = REPEATED_NEW_LINES.sub('\n', doc)
+        for character, value in deferred:
+            if character in doc:
+                doc = doc.replace(character, value)
+        return doc
+
+    return normalize
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compiles the createCleanCorpus cleaning rules into one cleaner
+The rules are: lowercasing, stripping characters from the ends of tokens,
+splitting tokens on characters inside them, removing numerals and exercise numbers,
+splitting on digits, removing single letters and unwanted strings,
+and the manual hyphen split and removal lists.
+The cleaner applies all of them to a word in one function call, with the character rules
+folded into a translate table and the lists turned into frozensets,
+and gives the same tokens as running the steps in createCleanCorpus one after the other
+"""
+
+# ----- LIBRARIES ----- #
+from functools import lru_cache
+import re
+# ---------------------------------------------------------------------- #
+
+# ----- PRE-DEFINED CONSTANTS ----- #
+
+# strips characters from front and back of tokens
+characters_to_remove = '“”"…!#$%&@()()*+,-./:;<=>➢?@[\\]^_`{|}~•●•_«»✶’‘✓üûð☐'
+
+# splits tokens with a given character two words e.g. 'loss.more' with whitespace
+removeFromBetween = './—–―;:<=>➢?@[\\]^_`{|}~•●•_«»“”"…!#$%&@()()*+,'
+
+# ord 8211, 8212, 8213 are all hyphens also 45 (normal use)
+hyphenList = ['–', '—', '-', '―']
+
+# single letters that are words
+valid_singles = ['i', 'a']
+
+# specific unwanted strings
+inValid_tokens = ['ab', 'fj', 'bcefh', 'abce', 'acd', 'bcdeh']
+
+# how many distinct words the cleaner remembers the result for. Word frequencies are Zipfian,
+# so the commonest few ten thousand words cover most tokens; bigger caches mostly hold rare words
+# and get slower as they outgrow the CPU caches
+CACHE_SIZE = 1 << 16
+
+EXERCISE_NUMBER = re.compile(r'\d-\d')
+NUMERALS = re.compile(r'\d+')
+
+# ---------------------------------------------------------------------- #
+
+# ----- HELPER FUNCTIONS ----- #
+
+
+class SplitTable(dict):
+    """
+    Translation table that keeps every character it hasn't been told to change
+    A plain dict table is slow for characters it doesn't have, so each one is added
+    the first time it is seen, and after that it is a plain dict lookup
+    """
+
+    def __missing__(self, codePoint):
+        self[codePoint] = codePoint
+        return codePoint
+
+# ---------------------------------------------------------------------- #
+
+
+def splitTable(characters):
+    """
+    Translation table that turns the characters of the regex character class "[" + characters + "]" into spaces
+    Each character is checked against the regex itself, so escapes like the \\] in removeFromBetween
+    come out the same as they do in re.sub (ranges such as a-z aren't expanded)
+    """
+
+    pattern = re.compile("[" + characters + "]")
+    return SplitTable({ord(character): ' ' for character in set(characters) if pattern.match(character)})
+
+# ---------------------------------------------------------------------- #
+
+
+def compileCleaner(charactersToRemove=characters_to_remove, betweenCharacters=removeFromBetween, hyphens=hyphenList,
+                   validSingles=valid_singles, invalidTokens=inValid_tokens, splitHyphenList=None, manRemove=None,
+                   cacheSize=0):
+    """
+    Returns a function clean(word) that gives (tokens, events) for one white space separated word
+        tokens - the cleaned tokens the word turns into, in order (often just one, sometimes none)
+        events - (counter, key) pairs for the createCleanCorpus stats, e.g. ('num', '12'),
+                 in the order the steps would have counted them
+    splitHyphenList and manRemove are the strings marked in manRemnants.csv and remnants_ann.csv
+    (see annotationRules.py), or None if there is none.
+    Tokens in manRemove are counted but still returned, like countMarkedRemovals does
+    If cacheSize is set, the results for the last cacheSize distinct words are remembered,
+    so a word that turns up again isn't cleaned again. clean.cache_info() then gives the hits and misses
+    """
+
+    table = splitTable(betweenCharacters)
+    # a word of letters only has nothing to split on, so it can skip the translate
+    splitsLetters = any(chr(codePoint).isalpha() for codePoint in table)
+    hyphens = tuple(hyphens)
+    validSingles = frozenset(validSingles)
+    invalidTokens = frozenset(invalidTokens)
+    splitHyphens = frozenset(splitHyphenList or ())
+    removals = frozenset(manRemove or ())
+    exerciseNumber = EXERCISE_NUMBER.search
+    numerals = NUMERALS.sub
+
+    def clean(word):
+        tokens = []
+        events = []
+        word = word.lower().strip(charactersToRemove)
+        if word.isalpha() and not splitsLetters:
+            parts = (word,)
+        else:
+            parts = word.translate(table).split()
+
+        for part in parts:
+            if part.isalpha():
+                # letters only, so there are no hyphens or digits for the next rules to look at
+                pieces = (part,)
+            else:
+                for hyphen in hyphens:
+                    if hyphen in part:
+                        events.append(('hyphens', part))
+                if part.isdigit():
+                    events.append(('num', part))
+                    continue
+                if exerciseNumber(part):
+                    events.append(('exNum', part))
+                    continue
+                pieces = numerals(" ", part).split()
+
+            for piece in pieces:
+                # remove single letters except 'i' and 'a'
+                if len(piece) < 2 and piece not in validSingles:
+                    continue
+                if piece in invalidTokens:
+                    events.append(('discard', piece))
+                    continue
+                if piece in splitHyphens:
+                    for token in piece.replace('-', ' ').split():
+                        if token in removals:
+                            events.append(('manRemove', token))
+                        tokens.append(token)
+                else:
+                    if piece in removals:
+                        events.append(('manRemove', piece))
+                    tokens.append(piece)
+
+        # tuples, since a cached result is handed out again and mustn't be changed
+        return tuple(tokens), tuple(events)
+
+    if cacheSize:
+        # least recently used words are dropped first, so memory stays bounded on huge vocabularies
+        return lru_cache(maxsize=cacheSize)(clean)
+    return clean
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Holds a cleaned corpus as integer ids instead of a list of strings
+Every distinct token (type) is stored once in the Vocabulary and given an id,
+and the Corpus keeps one 4 byte id per token in an array, so a corpus of millions of tokens
+takes a few bytes per token instead of a string object each.
+Type counts are kept as tokens are added, and ids are turned back into strings when iterated over.
+
+A corpus is saved as files next to each other:
+    <name>.vocab  - one type per line, tab, its count, in id order
+    <name>.ids    - the token ids, 4 byte little endian unsigned integers, in corpus order
+    <name>.source - the size and hash of the text file it was read from, and its number of tokens,
+                    so the saved ids are only used while they match the text, however the files were copied
+"""
+
+# ----- LIBRARIES ----- #
+from array import array
+from collections import Counter
+from itertools import islice, repeat
+import json
+import os
+import sys
+
+from conversionManifest import hashFile
+# ---------------------------------------------------------------------- #
+
+# ----- PRE-DEFINED CONSTANTS ----- #
+
+# array type codes for token ids (4 bytes, up to 4 billion types) and type counts (8 bytes)
+ID_TYPE = 'I'
+COUNT_TYPE = 'Q'
+
+# number of tokens added at a time by Corpus.extend
+EXTEND_BATCH = 1 << 16
+
+VOCAB_EXTENSION = '.vocab'
+IDS_EXTENSION = '.ids'
+SOURCE_EXTENSION = '.source'
+
+# ---------------------------------------------------------------------- #
+
+# ----- HELPER FUNCTIONS ----- #
+
+
+class TypeIndex(dict):
+    """
+    Maps each type to its id, and gives a type it doesn't have yet the next id (adding it to types)
+    the first time it is looked up with index[word], so ids can be looked up for a whole batch of tokens in C
+    """
+
+    def __init__(self, types):
+        super().__init__()
+        self.types = types
+
+    def __missing__(self, word):
+        wordId = self[word] = len(self.types)
+        self.types.append(word)
+        return wordId
+
+# ---------------------------------------------------------------------- #
+
+
+class Vocabulary:
+    """
+    The distinct tokens of a corpus, each with an id (its position in types) and a count
+    """
+
+    def __init__(self):
+        self.types = []
+        self.index = TypeIndex(self.types)
+        self.counts = array(COUNT_TYPE)
+
+    def __len__(self):
+        return len(self.types)
+
+    def __contains__(self, word):
+        return word in self.index
+
+    def intern(self, word):
+        """
+        Returns the id of word, adding it with a count of 0 if it is new
+        """
+
+        wordId = self.index[word]
+        if wordId == len(self.counts):
+            self.counts.append(0)
+        return wordId
+
+    def addCounts(self, ids):
+        """
+        Counts the tokens with these ids, which may include types just added by looking them up in index
+        """
+
+        self.counts.extend(repeat(0, len(self.types) - len(self.counts)))
+        counts = self.counts
+        for wordId, count in Counter(ids).items():
+            counts[wordId] += count
+
+    def count(self, word):
+        """
+        Number of times word is in the corpus, 0 if it isn't
+        """
+
+        wordId = self.index.get(word)
+        return 0 if wordId is None else self.counts[wordId]
+
+# ---------------------------------------------------------------------- #
+
+
+class Corpus:
+    """
+    A sequence of tokens stored as ids into a Vocabulary
+    Iterating over it, indexing and slicing give back strings, like the list of tokens it replaces
+    """
+
+    def __init__(self, vocabulary=None):
+        self.vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+        self.ids = array(ID_TYPE)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return map(self.vocabulary.types.__getitem__, self.ids)
+
+    def __getitem__(self, index):
+        types = self.vocabulary.types
+        if isinstance(index, slice):
+            return [types[wordId] for wordId in self.ids[index]]
+        return types[self.ids[index]]
+
+    def append(self, token):
+        wordId = self.vocabulary.intern(token)
+        self.vocabulary.counts[wordId] += 1
+        self.ids.append(wordId)
+
+    def extend(self, tokens):
+        # a batch at a time, so each token is looked up and counted in C rather than with a call to append
+        tokens = iter(tokens)
+        lookUp = self.vocabulary.index.__getitem__
+        for batch in iter(lambda: list(islice(tokens, EXTEND_BATCH)), []):
+            ids = array(ID_TYPE, map(lookUp, batch))
+            self.vocabulary.addCounts(ids)
+            self.ids.extend(ids)
+
+    def count(self, word):
+        """
+        Number of times word is in the corpus
+        """
+
+        return self.vocabulary.count(word)
+
+    def types(self):
+        """
+        Set of the distinct tokens, made from the vocabulary rather than from every token
+        """
+
+        return set(self.vocabulary.types)
+
+    def save(self, path, textFile=None):
+        """
+        Writes path + '.vocab' and path + '.ids'
+        If textFile is the text the corpus was made from, path + '.source' records it,
+        so readCorpus knows the saved ids still match it
+        """
+
+        with open(path + VOCAB_EXTENSION, 'w', encoding='utf-8') as vocabFile:
+            for word, count in zip(self.vocabulary.types, self.vocabulary.counts):
+                vocabFile.write('{}\t{}\n'.format(word, count))
+
+        ids = self.ids
+        if sys.byteorder == 'big':
+            ids = array(ID_TYPE, ids)
+            ids.byteswap()
+        with open(path + IDS_EXTENSION, 'wb') as idsFile:
+            ids.tofile(idsFile)
+
+        # written last, so a save that was cut short is never taken for a complete one
+        if textFile is not None:
+            record = textRecord(textFile)
+            record['tokens'] = len(self.ids)
+            with open(path + SOURCE_EXTENSION, 'w') as sourceFile:
+                json.dump(record, sourceFile, indent=1, sort_keys=True)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a corpus saved with save(path)
+        """
+
+        corpus = cls()
+        vocabulary = corpus.vocabulary
+        with open(path + VOCAB_EXTENSION, 'r', encoding='utf-8') as vocabFile:
+            for line in vocabFile:
+                word, count = line.rstrip('\n').rsplit('\t', 1)
+                vocabulary.index[word] = len(vocabulary.types)
+                vocabulary.types.append(word)
+                vocabulary.counts.append(int(count))
+
+        idsPath = path + IDS_EXTENSION
+        with open(idsPath, 'rb') as idsFile:
+            corpus.ids.fromfile(idsFile, os.path.getsize(idsPath) // corpus.ids.itemsize)
+        if sys.byteorder == 'big':
+            corpus.ids.byteswap()
+        return corpus
+
+# ---------------------------------------------------------------------- #
+
+
+def textRecord(textFile):
+    """
+    Size and content hash of a text file, the modification time changes when it is copied so it isn't used
+    """
+
+    return {'size': os.path.getsize(textFile), 'sha256': hashFile(textFile)}
+
+# ---------------------------------------------------------------------- #
+
+
+def internTokens(tokens, corpus):
+    """
+    Passes every token on, adding it to corpus on the way
+    """
+
+    for token in tokens:
+        corpus.append(token)
+        yield token
+
+# ---------------------------------------------------------------------- #
+
+
+def readCorpus(path):
+    """
+    Reads the corpus in the text file path, e.g. manCleanTIW.txt
+    If it has been saved next to it from this text (manCleanTIW.vocab, manCleanTIW.ids and manCleanTIW.source),
+    that is loaded instead, otherwise the first word of every line of the text file is read
+    """
+
+    base = os.path.splitext(path)[0]
+    saved = [base + VOCAB_EXTENSION, base + IDS_EXTENSION, base + SOURCE_EXTENSION]
+    if all(os.path.exists(savedFile) for savedFile in saved):
+        with open(base + SOURCE_EXTENSION, 'r') as sourceFile:
+            record = json.load(sourceFile)
+        # unless the text file has been written again since, checked by size first and only then by hash
+        if not os.path.exists(path) or (os.path.getsize(path) == record['size']
+                                        and hashFile(path) == record['sha256']):
+            corpus = Corpus.load(base)
+            if len(corpus) == record['tokens']:
+                return corpus
+
+    corpus = Corpus()
+    with open(path, 'r') as textFile:
+        corpus.extend(words[0] for words in map(str.split, textFile) if words)
+    return corpus